@@ -1,7 +1,10 @@
 from website import create_app
 
 
-app = create_app()
+# The PDF extraction workers import this file as __mp_main__; they must not
+# build a second app (pool, scheduler, model)
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
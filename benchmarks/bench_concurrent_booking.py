@@ -0,0 +1,117 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, current_app
+from website.booking import book_consultation, SlotUnavailable
+from website.database_backends import SqliteBackend
+from website.database_connection import ConnectionPool, PooledConnection
+from website.notifications import create_consultation_notification
+from website.slot_index import SlotIndex
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sql_counting import CountingBackend
+
+
+def legacy_book_consultation(pacient_id, medic_id, availability_id, notes, patient_name):
+    # The three-commit flow add_consultation used before, without a FREE check
+    conn = current_app.db
+    cursor = conn.cursor()
+    start_time = cursor.execute("SELECT [start_time] FROM [Availability] WHERE [availabilityID] = ?", availability_id).fetchone()[0]
+    cursor.execute("INSERT INTO [Appointment] ([pacientID], [medicID], [appointment_date], [notes], [serviceID], [availabilityID]) VALUES (?, ?, ?, ?, ?, ?)",
+                   pacient_id, medic_id, start_time, notes, 1, availability_id)
+    conn.commit()
+    cursor.execute("UPDATE [Availability] SET [availability_status] = 'BOOKED' WHERE [availabilityID] = ?", availability_id)
+    conn.commit()
+    appointment_id = cursor.execute(
+        "SELECT [appointmentID] FROM [Appointment] WHERE [pacientID] = ? AND [medicID] = ? AND [appointment_date] = ? ORDER BY [appointmentID] DESC LIMIT 1",
+        (pacient_id, medic_id, start_time)).fetchone()[0]
+    create_consultation_notification(medic_id, appointment_id, patient_name, start_time)
+
+
+def seed(app, doctors, slots_per_doctor, patients):
+    with app.app_context():
+        cursor = current_app.db.cursor()
+        cursor.executemany("INSERT INTO [User] ([userID], [email], [password], [username], [roleID]) VALUES (?, ?, ?, ?, ?)",
+                           [(i, f'user{i}@bench.local', '-', f'User {i}', 3 if i <= doctors else 2) for i in range(1, doctors + patients + 1)])
+        cursor.executemany("INSERT INTO [Medic] ([medicID]) VALUES (?)", [(i,) for i in range(1, doctors + 1)])
+        cursor.executemany("INSERT INTO [Pacient] ([pacientID]) VALUES (?)", [(i,) for i in range(doctors + 1, doctors + patients + 1)])
+        tomorrow = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time(8))
+        slots = []
+        for medic_id in range(1, doctors + 1):
+            for n in range(slots_per_doctor):
+                start = tomorrow + datetime.timedelta(minutes=30 * n)
+                slots.append((medic_id, start.date(), start, start + datetime.timedelta(minutes=30), 'FREE'))
+        cursor.executemany("INSERT INTO [Availability] ([medicID], [date], [start_time], [end_time], [availability_status]) VALUES (?, ?, ?, ?, ?)", slots)
+        current_app.db.commit()
+        return [(row.availabilityID, row.medicID) for row in cursor.execute("SELECT [availabilityID], [medicID] FROM [Availability]").fetchall()]
+
+
+def run(book, threads, attempts, doctors, slots_per_doctor):
+    with tempfile.TemporaryDirectory() as directory:
+        backend = CountingBackend(SqliteBackend(os.path.join(directory, 'bench.sqlite3')))
+        app = Flask(__name__)
+        app.db = PooledConnection(ConnectionPool(backend.connect, max_size=threads), backend)
+        app.db.init_app(app)
+        app.slot_index = SlotIndex()
+        slots = seed(app, doctors, slots_per_doctor, threads)
+        backend.reset()
+
+        results = {"booked": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+        rng = random.Random(42)
+        plans = [[rng.choice(slots) for _ in range(attempts)] for _ in range(threads)]
+
+        def patient(index):
+            for availability_id, medic_id in plans[index]:
+                with app.app_context():
+                    try:
+                        book(doctors + 1 + index, medic_id, availability_id, 'Load test', f'User {index}')
+                        outcome = "booked"
+                    except SlotUnavailable:
+                        outcome = "rejected"
+                    except Exception:
+                        outcome = "errors"
+                with lock:
+                    results[outcome] += 1
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=patient, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        results["seconds"] = time.perf_counter() - start
+        results["statements"], results["commits"] = backend.totals()
+
+        with app.app_context():
+            results["double_booked"] = current_app.db.cursor().execute(
+                "SELECT COUNT(*) FROM (SELECT [availabilityID] FROM [Appointment] GROUP BY [availabilityID] HAVING COUNT(*) > 1) d").fetchone()[0]
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent booking load test: double bookings and round trips per booking")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=50, help="booking attempts per thread")
+    parser.add_argument('--doctors', type=int, default=5)
+    parser.add_argument('--slots', type=int, default=20, help="free slots per doctor")
+    args = parser.parse_args()
+
+    for name, book in [("legacy", legacy_book_consultation), ("transactional", book_consultation)]:
+        r = run(book, args.threads, args.attempts, args.doctors, args.slots)
+        attempts = r["booked"] + r["rejected"] + r["errors"]
+        print(f"{name:>13}: {r['booked']} booked, {r['rejected']} rejected, {r['errors']} errors, "
+              f"{r['double_booked']} double-booked slots, {r['statements'] / attempts:.1f} statements and "
+              f"{r['commits'] / attempts:.1f} commits per attempt, {r['seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
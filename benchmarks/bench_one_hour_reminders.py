@@ -0,0 +1,100 @@
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, current_app
+from website.database_backends import SqliteBackend
+from website.database_connection import ConnectionPool, PooledConnection
+from website.notifications import generate_one_hour_notifications
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sql_counting import CountingBackend
+
+
+def legacy_generate_one_hour_notifications():
+    # The per-consultation implementation this job replaced, kept for comparison
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    now = datetime.datetime.now()
+    one_hour_later = now + datetime.timedelta(hours=1)
+
+    consultations = cursor.execute(
+        """
+        SELECT appointmentID, medicID, pacientID, appointment_date
+        FROM Appointment
+        WHERE appointment_date BETWEEN ? AND ?
+        AND (notes NOT LIKE '%Cancellation Reason:%' OR notes IS NULL)
+        """,
+        (now, one_hour_later)).fetchall()
+
+    for consultation in consultations:
+        consultation_pacientID = consultation[2]
+        consultation_medicID = consultation[1]
+        for user_id in [consultation_pacientID, consultation_medicID]:
+            existing_notification = cursor.execute(
+                "SELECT id FROM Notification WHERE consultation_id = ? AND user_id = ? AND type = 'one_hour'",
+                (consultation.appointmentID, user_id)).fetchone()
+
+            if not existing_notification:
+                formatted_datetime = consultation.appointment_date.strftime('%Y-%m-%d %H:%M')
+                other_id = consultation_medicID if user_id == consultation_pacientID else consultation_pacientID
+                other = cursor.execute("SELECT username FROM [User] WHERE userID = ?", (other_id,)).fetchone()
+                message = f"Reminder: consultation with {other.username} at {formatted_datetime}."
+                cursor.execute(
+                    "INSERT INTO Notification (user_id, consultation_id, message, type) VALUES (?, ?, ?, 'one_hour')",
+                    (user_id, consultation.appointmentID, message))
+                conn.commit()
+
+
+def seed(app, upcoming):
+    with app.app_context():
+        cursor = current_app.db.cursor()
+        now = datetime.datetime.now()
+        users = [(i, f'user{i}@bench.local', '-', f'User {i}', 3 if i <= upcoming else 2) for i in range(1, 2 * upcoming + 1)]
+        cursor.executemany("INSERT INTO [User] ([userID], [email], [password], [username], [roleID]) VALUES (?, ?, ?, ?, ?)", users)
+        appointments = [(upcoming + i, i, now + datetime.timedelta(seconds=60 + (i * 3000) // upcoming), 1, 'Benchmark consultation')
+                        for i in range(1, upcoming + 1)]
+        cursor.executemany("INSERT INTO [Appointment] ([pacientID], [medicID], [appointment_date], [serviceID], [notes]) VALUES (?, ?, ?, ?, ?)", appointments)
+        current_app.db.commit()
+
+
+def run(job, upcoming):
+    with tempfile.TemporaryDirectory() as directory:
+        backend = CountingBackend(SqliteBackend(os.path.join(directory, 'bench.sqlite3')))
+        app = Flask(__name__)
+        app.db = PooledConnection(ConnectionPool(backend.connect, max_size=1), backend)
+        app.db.init_app(app)
+        seed(app, upcoming)
+
+        with app.app_context():
+            backend.reset()
+            start = time.perf_counter()
+            job()
+            elapsed = time.perf_counter() - start
+            statements, commits = backend.totals()
+            inserted = current_app.db.cursor().execute("SELECT COUNT(*) FROM Notification WHERE type = 'one_hour'").fetchone()[0]
+        return elapsed, statements, commits, inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the per-consultation and set-based one-hour reminder jobs")
+    parser.add_argument('--sizes', default='10,100,1000,5000', help="comma separated numbers of upcoming appointments")
+    args = parser.parse_args()
+
+    print(f"{'upcoming':>9} | {'legacy ms':>10} {'stmts':>7} {'commits':>7} | {'set-based ms':>12} {'stmts':>5} {'commits':>7} | {'speedup':>7}")
+    for upcoming in [int(size) for size in args.sizes.split(',')]:
+        legacy = run(legacy_generate_one_hour_notifications, upcoming)
+        set_based = run(generate_one_hour_notifications, upcoming)
+        assert legacy[3] == set_based[3] == 2 * upcoming
+        print(f"{upcoming:>9} | {legacy[0] * 1000:>10.1f} {legacy[1]:>7} {legacy[2]:>7} | "
+              f"{set_based[0] * 1000:>12.1f} {set_based[1]:>5} {set_based[2]:>7} | {legacy[0] / set_based[0]:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
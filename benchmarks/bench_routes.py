@@ -0,0 +1,231 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from website import create_app
+from website.database_backends import SqliteBackend, bootstrap_schema
+from website.database_connection import ConnectionPool
+from generate_synthetic_data import generate, DEFAULT_PASSWORD
+from sql_counting import CountingBackend
+from modules.ai_diagnosis_prediction.prediction_cache import PredictionCache
+from modules.ai_diagnosis_prediction.strategies.prediction_strategy import PredictionStrategy
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'routes.json')
+
+# Seeded database used when --database does not exist yet
+SEED = dict(doctors=200, patients=2000, appointments=50000, days_back=365, days_ahead=30,
+            free_slots=48, cancelled_ratio=0.1, seed=42)
+
+
+def seed_database(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path)
+    bootstrap_schema(connection)
+    generate(connection, **SEED)
+    connection.execute("ANALYZE")
+    connection.close()
+
+
+class StubDiagnosisStrategy(PredictionStrategy):
+    # Stands in for the trained checkpoint, so POST /diagnosis runs the
+    # batching predictor, the prediction cache and the template without it
+    def load_model(self, model_path):
+        pass
+
+    def generate_disease_name(self, symptom_description):
+        return "Common Cold"
+
+
+def install_stub_model():
+    # Registered through ModelRegistry like a real strategy. The prediction
+    # cache is replaced by an in-memory one first: a new model version would
+    # otherwise clear the instance/ file
+    import website.generate_diagnosis as diagnosis
+    diagnosis.prediction_cache = diagnosis.model_registry.cache = PredictionCache()
+    diagnosis.model_registry.swap_strategy(StubDiagnosisStrategy)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def login(app, email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': DEFAULT_PASSWORD})
+    if response.status_code != 302:
+        raise SystemExit(f"Could not log in as {email}")
+    return client
+
+
+def routes(app):
+    # (name, method, path, form data factory) per measured route. Requests
+    # are made as the first seeded patient; /get-slots asks for a doctor and
+    # day that have free slots. POST /diagnosis sends different symptoms
+    # every time, so each request reaches the (stub) model; PDF uploads are
+    # not measured.
+    with app.app_context():
+        cursor = app.db.cursor()
+        slot = cursor.execute("SELECT [medicID], [date] FROM [Availability] WHERE [availability_status] = 'FREE' AND [start_time] > ? ORDER BY [start_time] LIMIT 1",
+                              datetime.datetime.now()).fetchone()
+        specialization_id = cursor.execute("SELECT [specializationID] FROM [Medic] WHERE [medicID] = ?", slot.medicID).fetchone()[0]
+    symptoms = itertools.count()
+    return [
+        ('/', 'GET', '/', None),
+        ('/my-consultations', 'GET', '/my-consultations', None),
+        ('/get-slots', 'GET', f'/get-slots?doctor_id={slot.medicID}&appointment_date={slot.date}', None),
+        ('/get-doctors', 'GET', f'/get-doctors?specialization_id={specialization_id}', None),
+        ('/notifications', 'GET', '/notifications', None),
+        ('/consultation-form', 'GET', '/consultation-form', None),
+        ('/diagnosis', 'GET', '/diagnosis', None),
+        ('POST /diagnosis', 'POST', '/diagnosis', lambda: {'symptoms': f"fever, cough, headache {next(symptoms)}"}),
+    ]
+
+
+def send(client, method, path, data):
+    if method == 'POST':
+        return client.post(path, data=data())
+    return client.get(path)
+
+
+def measure(app, backend, route, requests, warmup, concurrency):
+    _, method, path, data = route
+    clients = [login(app, 'patient1@telemedix.local') for _ in range(concurrency)]
+    for _ in range(warmup):
+        send(clients[0], method, path, data)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(client, count):
+        for _ in range(count):
+            start = time.perf_counter()
+            response = send(client, method, path, data)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    backend.reset()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(client, count)) for client, count in zip(clients, per_client)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    statements, commits = backend.totals()
+
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput": len(latencies) / elapsed,
+        "statements": statements / len(latencies),
+        "commits": commits / len(latencies),
+        "errors": len(errors),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    # A route regresses when its p95 latency grows by more than tolerance (and
+    # by at least min_delta ms, so sub-millisecond noise is ignored) or when
+    # it issues more SQL statements per request than the baseline
+    regressions = []
+    for route, result in results.items():
+        previous = baseline.get(route)
+        if previous is None:
+            continue
+        if result["p95_ms"] > max(previous["p95_ms"] * (1 + tolerance), previous["p95_ms"] + min_delta):
+            regressions.append(f"{route}: p95 {previous['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["statements"] > previous["statements"] + 0.01:
+            regressions.append(f"{route}: {previous['statements']:.1f} -> {result['statements']:.1f} statements per request")
+        if result["errors"]:
+            regressions.append(f"{route}: {result['errors']} error responses")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the Flask routes against a seeded SQLite database and compare with a stored baseline")
+    parser.add_argument('--database', default='instance/bench_routes.sqlite3', help="seeded on first use")
+    parser.add_argument('--requests', type=int, default=200, help="requests per route")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative p95 increase")
+    parser.add_argument('--min-delta', type=float, default=1.0, help="p95 increase in ms below which no regression is reported")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--routes', help="comma separated subset of routes to run")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if not os.path.exists(args.database):
+        print(f"Seeding {args.database} ...")
+        seed_database(args.database)
+
+    app = create_app({'DATABASE_BACKEND': 'sqlite', 'SQLITE_PATH': args.database, 'SCHEDULER_ENABLED': False, 'TESTING': True})
+    # Same pool as in production, over connections that count statements
+    backend = CountingBackend(SqliteBackend(args.database))
+    app.db.pool = ConnectionPool(backend.connect, max_size=max(args.concurrency, 2))
+    app.db.backend = backend
+
+    install_stub_model()
+
+    selected = routes(app)
+    if args.routes:
+        wanted = args.routes.split(',')
+        selected = [route for route in selected if route[0] in wanted]
+
+    results = {}
+    print(f"{'route':<20} | {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} | {'req/s':>7} | {'stmts':>5} {'commits':>7} | {'errors':>6}")
+    for route in selected:
+        result = measure(app, backend, route, args.requests, args.warmup, args.concurrency)
+        name = route[0]
+        results[name] = {key: round(value, 3) for key, value in result.items()}
+        print(f"{name:<20} | {result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f} {result['p99_ms']:>7.2f} | "
+              f"{result['throughput']:>7.1f} | {result['statements']:>5.1f} {result['commits']:>7.1f} | {result['errors']:>6}")
+
+    # Latencies are only comparable between runs with the same settings
+    settings = {"requests": args.requests, "concurrency": args.concurrency, "seed": SEED}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump({"settings": settings, "routes": results}, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline["settings"] != settings:
+        print(f"The baseline was recorded with different settings: {baseline['settings']}")
+    regressions = compare(results, baseline["routes"], args.tolerance, args.min_delta)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, current_app
+from website.database_backends import SqliteBackend, limit_rows
+from website.database_connection import ConnectionPool, PooledConnection
+from website.slot_index import SlotIndex
+
+
+# The SQL scans the index replaces, kept for comparison
+def sql_day_slots(medic_id, day):
+    cursor = current_app.db.cursor()
+    return cursor.execute("SELECT [availabilityID], [start_time], [end_time] FROM [Availability] WHERE [medicID] = ? AND [date] = ? AND [availability_status] = 'FREE'",
+                          medic_id, day.date()).fetchall()
+
+def sql_week_slots(medic_id, day):
+    cursor = current_app.db.cursor()
+    return cursor.execute("SELECT [availabilityID], [start_time], [end_time] FROM [Availability] WHERE [medicID] = ? AND [start_time] >= ? AND [start_time] < ? AND [availability_status] = 'FREE' ORDER BY [start_time]",
+                          medic_id, day, day + datetime.timedelta(days=7)).fetchall()
+
+def sql_first_free_slot(specialization_id, after):
+    conn = current_app.db
+    query = """
+        SELECT [Availability].[availabilityID], [Availability].[medicID], [Availability].[start_time]
+        FROM [Availability]
+        JOIN [Medic] ON [Medic].[medicID] = [Availability].[medicID]
+        WHERE [Medic].[specializationID] = ? AND [Availability].[availability_status] = 'FREE' AND [Availability].[start_time] > ?
+        ORDER BY [Availability].[start_time]"""
+    return conn.cursor().execute(limit_rows(query, 1, conn.dialect), specialization_id, after).fetchone()
+
+
+def timed(queries, function):
+    start = time.perf_counter()
+    for arguments in queries:
+        function(*arguments)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare free-slot searches through SQL scans and through the in-memory slot index")
+    parser.add_argument('--database', default='instance/telemedix.sqlite3', help="SQLite database made by scripts/generate_synthetic_data.py")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        parser.error(f"{args.database} does not exist, create it with scripts/generate_synthetic_data.py")
+
+    backend = SqliteBackend(args.database)
+    app = Flask(__name__)
+    app.db = PooledConnection(ConnectionPool(backend.connect, max_size=1), backend)
+    app.db.init_app(app)
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        cursor = current_app.db.cursor()
+        doctors = [row[0] for row in cursor.execute("SELECT [medicID] FROM [Medic]").fetchall()]
+        specializations = [row[0] for row in cursor.execute("SELECT DISTINCT [specializationID] FROM [Medic]").fetchall()]
+
+        index = SlotIndex(refresh_interval=float('inf'))
+        start = time.perf_counter()
+        index.load()
+        build_time = (time.perf_counter() - start) * 1000
+        print(f"Index of {index.stats()['slots']} free slots for {index.stats()['doctors']} doctors built in {build_time:.1f} ms")
+
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        days = [today + datetime.timedelta(days=rng.randrange(14)) for _ in range(args.queries)]
+        doctor_days = [(rng.choice(doctors), day) for day in days]
+        specialization_times = [(rng.choice(specializations), day + datetime.timedelta(hours=rng.randrange(24))) for day in days]
+
+        cases = [
+            ("free slots of a doctor on a day", doctor_days, sql_day_slots,
+             lambda medic_id, day: index.free_slots(medic_id, day, day + datetime.timedelta(days=1))),
+            ("free slots of a doctor this week", doctor_days, sql_week_slots,
+             lambda medic_id, day: index.free_slots(medic_id, day, day + datetime.timedelta(days=7))),
+            ("first free slot of a specialization", specialization_times, sql_first_free_slot,
+             index.first_free_slot),
+        ]
+
+        print(f"{'query':<38} | {'SQL ms':>8} | {'index ms':>8} | {'speedup':>7}")
+        for name, queries, sql_function, index_function in cases:
+            sql_ms = timed(queries, sql_function)
+            index_ms = timed(queries, index_function)
+            print(f"{name:<38} | {sql_ms:>8.3f} | {index_ms:>8.3f} | {sql_ms / index_ms:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
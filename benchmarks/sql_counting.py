@@ -0,0 +1,74 @@
+import threading
+
+
+class CountingConnection:
+    # Wraps a DB-API connection and counts the statements and commits issued
+    # through it. Each pooled connection is used by one thread at a time, so
+    # the counters need no locking; totals are summed over all connections.
+    def __init__(self, connection):
+        self.connection = connection
+        self.statements = 0
+        self.commits = 0
+
+    def cursor(self):
+        return CountingCursor(self, self.connection.cursor())
+
+    def commit(self):
+        self.commits += 1
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+class CountingCursor:
+    def __init__(self, owner, cursor):
+        self.owner = owner
+        self.cursor = cursor
+
+    def execute(self, sql, *params):
+        self.owner.statements += 1
+        self.cursor.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, params):
+        self.owner.statements += 1
+        self.cursor.executemany(sql, params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class CountingBackend:
+    # Backend wrapper whose connections are CountingConnections
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        connection = CountingConnection(self.backend.connect())
+        with self._lock:
+            self.connections.append(connection)
+        return connection
+
+    def reset(self):
+        for connection in self.connections:
+            connection.statements = 0
+            connection.commits = 0
+
+    def totals(self):
+        return (sum(connection.statements for connection in self.connections),
+                sum(connection.commits for connection in self.connections))
+
+    def __getattr__(self, name):
+        # is_connection_error, is_integrity_error and the rest of the backend
+        return getattr(self.backend, name)
@@ -1,8 +1,9 @@
 from modules.ai_diagnosis_prediction.strategies.prediction_strategy import PredictionStrategy
 
 class AIContext:
-    def __init__(self, strategy: PredictionStrategy):
+    def __init__(self, strategy: PredictionStrategy, cache=None):
         self.strategy = strategy
+        self.cache = cache
 
     def set_strategy(self, strategy: PredictionStrategy):
         self.strategy = strategy
@@ -10,5 +11,25 @@ class AIContext:
     def load_model(self, model_path):
         self.strategy.load_model(model_path)
 
+    def cached_disease_name(self, symptom_description):
+        if self.cache is None:
+            return None
+        # A miss here is counted when the description reaches generate_disease_names
+        return self.cache.get(symptom_description, count_miss=False)
+
     def generate_disease_name(self, symptom_description):
-        return self.strategy.generate_disease_name(symptom_description)
+        return self.generate_disease_names([symptom_description])[0]
+
+    def generate_disease_names(self, symptom_descriptions):
+        if self.cache is None:
+            return self.strategy.generate_disease_names(symptom_descriptions)
+
+        # Only the descriptions missing from the cache reach the model
+        results = [self.cache.get(description) for description in symptom_descriptions]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            predictions = self.strategy.generate_disease_names([symptom_descriptions[i] for i in missing])
+            for i, prediction in zip(missing, predictions):
+                results[i] = prediction
+                self.cache.put(symptom_descriptions[i], prediction)
+        return results
@@ -0,0 +1,84 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+# Upper bound on how long a caller waits for its batch, so a stalled or dead
+# worker thread cannot hold request threads (and their DB connections) forever
+PREDICT_TIMEOUT = 60
+
+
+class BatchingPredictor:
+    # Collects concurrent symptom descriptions for up to max_wait seconds and
+    # runs them through the model as a single batched generate call
+    def __init__(self, context_provider, max_batch_size=16, max_wait=0.005, timeout=PREDICT_TIMEOUT):
+        self.context_provider = context_provider
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def predict(self, symptom_description, timeout=None):
+        # Raises TimeoutError when no result arrives within timeout seconds
+        # (self.timeout by default); the request is then dropped from the queue
+        cached = self.context_provider().cached_disease_name(symptom_description)
+        if cached is not None:
+            return cached
+        future = self.submit(symptom_description)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, symptom_description):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((symptom_description, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="diagnosis-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Requests whose caller already gave up are dropped from the batch
+        batch = [(description, future) for description, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        descriptions = [description for description, _ in batch]
+        futures = [future for _, future in batch]
+
+        try:
+            results = self.context_provider().generate_disease_names(descriptions)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
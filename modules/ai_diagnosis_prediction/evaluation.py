@@ -0,0 +1,67 @@
+import argparse
+import sys
+import time
+
+from modules.ai_diagnosis_prediction.strategies.diagnosis_classifier_strategy import DiagnosisClassifierStrategy
+from modules.ai_diagnosis_prediction.strategies.quantized_diagnosis_classifier_strategy import QuantizedDiagnosisClassifierStrategy
+
+
+def normalize_label(label):
+    return " ".join(label.lower().split())
+
+
+def score_strategy(strategy, examples, batch_size=16):
+    predictions = []
+    start = time.perf_counter()
+    for i in range(0, len(examples), batch_size):
+        batch = [symptoms for symptoms, _ in examples[i:i + batch_size]]
+        predictions.extend(strategy.generate_disease_names(batch))
+    elapsed = time.perf_counter() - start
+
+    correct = sum(1 for prediction, (_, name) in zip(predictions, examples)
+                  if normalize_label(prediction) == normalize_label(name))
+    return predictions, {
+        "accuracy": correct / len(examples) if examples else 0.0,
+        "seconds_per_example": elapsed / len(examples) if examples else 0.0,
+    }
+
+
+def compare_strategies(reference, candidate, examples, tolerance=0.01):
+    reference_predictions, reference_scores = score_strategy(reference, examples)
+    candidate_predictions, candidate_scores = score_strategy(candidate, examples)
+
+    agreement = sum(1 for a, b in zip(reference_predictions, candidate_predictions)
+                    if normalize_label(a) == normalize_label(b))
+    return {
+        "examples": len(examples),
+        "reference": reference_scores,
+        "candidate": candidate_scores,
+        "agreement": agreement / len(examples) if examples else 0.0,
+        "passed": candidate_scores["accuracy"] >= reference_scores["accuracy"] - tolerance,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy parity check of the quantized strategy against the fp32 one on the held-out split")
+    parser.add_argument("--model-path", default="modules/ai_diagnosis_prediction/trained_model")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    reference = DiagnosisClassifierStrategy()
+    reference.load_model(args.model_path)
+    candidate = QuantizedDiagnosisClassifierStrategy()
+    candidate.load_model(args.model_path)
+
+    examples = reference.model.held_out_examples()
+    report = compare_strategies(reference, candidate, examples, args.tolerance)
+
+    print(f"Held-out examples: {report['examples']}")
+    print(f"Reference accuracy: {report['reference']['accuracy']:.4f} ({report['reference']['seconds_per_example'] * 1000:.1f} ms/example)")
+    print(f"Quantized accuracy: {report['candidate']['accuracy']:.4f} ({report['candidate']['seconds_per_example'] * 1000:.1f} ms/example)")
+    print(f"Prediction agreement: {report['agreement']:.4f}")
+    print("Parity check " + ("passed" if report["passed"] else "failed"))
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
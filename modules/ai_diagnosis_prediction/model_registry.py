@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+import time
+
+from modules.ai_diagnosis_prediction.ai_context import AIContext
+
+
+def checkpoint_signature(model_path):
+    # Fingerprint of the checkpoint directory built from file names, sizes and
+    # modification times, so a changed checkpoint is noticed without reading it
+    if not os.path.isdir(model_path):
+        return None
+
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            relative_path = os.path.relpath(file_path, model_path)
+            digest.update(f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, strategy_factory, model_path, check_interval=30.0, cache=None, stage_observer=None):
+        self.strategy_factory = strategy_factory
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.cache = cache
+        # observer(stage, seconds) for checkpoint loads and, through the
+        # strategy, for every inference stage
+        self.stage_observer = stage_observer
+
+        self.ai_context = None
+        self.signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            self._load()
+        return self.ai_context
+
+    def swap_strategy(self, strategy_factory):
+        # Loads the checkpoint with another PredictionStrategy and hands it to
+        # the resident AIContext through set_strategy
+        with self._lock:
+            self.strategy_factory = strategy_factory
+            self._load()
+        return self.ai_context
+
+    def get_context(self):
+        if self.ai_context is None:
+            with self._lock:
+                if self.ai_context is None:
+                    self._load()
+            return self.ai_context
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            with self._lock:
+                if now - self._last_check >= self.check_interval:
+                    self._last_check = now
+                    if checkpoint_signature(self.model_path) != self.signature:
+                        self._load()
+        return self.ai_context
+
+    def _load(self):
+        start = time.perf_counter()
+        signature = checkpoint_signature(self.model_path)
+
+        # The new model is fully loaded before it replaces the resident one,
+        # so requests keep being served by the old model while reloading
+        strategy = self.strategy_factory()
+        strategy.load_model(self.model_path)
+        if self.stage_observer is not None:
+            strategy.set_stage_observer(self.stage_observer)
+
+        # Cached predictions belong to one checkpoint and strategy
+        if self.cache is not None:
+            self.cache.set_model_version(f"{self.strategy_factory.__name__}:{signature}")
+
+        if self.ai_context is None:
+            self.ai_context = AIContext(strategy, cache=self.cache)
+        else:
+            self.ai_context.set_strategy(strategy)
+
+        self.signature = signature
+        self._last_check = time.monotonic()
+        if self.stage_observer is not None:
+            self.stage_observer("load", time.perf_counter() - start)
+        print(f"Diagnosis model loaded from {self.model_path}")
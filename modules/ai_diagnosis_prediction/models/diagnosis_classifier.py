@@ -1,21 +1,39 @@
-from datasets import load_dataset
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, Seq2SeqTrainingArguments, Seq2SeqTrainer, DataCollatorForSeq2Seq
 import torch
 import os
+import time
 
 class DiagnosisClassifier:
-    def __init__(self, model_name="t5-small", dataset_name="QuyenAnhDE/Diseases_Symptoms"):
+    TEST_SIZE = 0.2
+    SPLIT_SEED = 42
+
+    # Optional observer(stage, seconds) for the tokenize, generate and decode
+    # stages of generate_disease_names
+    stage_observer = None
+
+    def __init__(self, model_name="t5-small", dataset_name="QuyenAnhDE/Diseases_Symptoms", inference_only=False):
+        # With inference_only, model_name is a trained checkpoint read from
+        # local files and the training dataset is not loaded
         self.model_name = model_name
         self.dataset_name = dataset_name
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(self.device)
+        self.load_model(model_name, local_files_only=inference_only)
 
-        self.dataset = load_dataset(dataset_name)
+        self.dataset = None
         self.tokenized_dataset = None
         self.train_dataset = None
         self.test_dataset = None
+        if not inference_only:
+            # datasets is only needed for training, keep it off the inference import path
+            from datasets import load_dataset
+            self.dataset = load_dataset(dataset_name)
+
+    @classmethod
+    def for_inference(cls, load_path="./model", dataset_name="QuyenAnhDE/Diseases_Symptoms"):
+        # Skips the base model download and the training dataset; only the
+        # trained checkpoint is read, from local files
+        return cls(load_path, dataset_name, inference_only=True)
 
     def preprocess_data(self, dataset):
         inputs = dataset["Symptoms"]
@@ -38,10 +56,20 @@ class DiagnosisClassifier:
         columns_to_remove = ["Symptoms", "Name", "Code", "Treatments"]
         self.tokenized_dataset = self.tokenized_dataset.remove_columns(columns_to_remove)
 
-        split = self.tokenized_dataset["train"].train_test_split(test_size=0.2, seed=42)
+        split = self.tokenized_dataset["train"].train_test_split(test_size=self.TEST_SIZE, seed=self.SPLIT_SEED)
         self.train_dataset = split["train"]
         self.test_dataset = split["test"]
 
+    def held_out_examples(self):
+        # Same split as prepare_dataset, but keeping the raw (symptoms, name) text
+        if self.dataset is None:
+            from datasets import load_dataset
+            self.dataset = load_dataset(self.dataset_name)
+
+        split = self.dataset["train"].train_test_split(test_size=self.TEST_SIZE, seed=self.SPLIT_SEED)
+        test = split["test"]
+        return list(zip(test["Symptoms"], test["Name"]))
+
     def train(self, output_dir="./results", num_train_epochs=1000):
         data_collator = DataCollatorForSeq2Seq(self.tokenizer, model=self.model)
 
@@ -75,9 +103,9 @@ class DiagnosisClassifier:
         self.model.save_pretrained(save_path)
         self.tokenizer.save_pretrained(save_path)
 
-    def load_model(self, load_path="./model"):
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(load_path).to(self.device)
-        self.tokenizer = AutoTokenizer.from_pretrained(load_path)
+    def load_model(self, load_path="./model", local_files_only=False):
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(load_path, local_files_only=local_files_only).to(self.device)
+        self.tokenizer = AutoTokenizer.from_pretrained(load_path, local_files_only=local_files_only)
 
     def evaluate(self):
         data_collator = DataCollatorForSeq2Seq(self.tokenizer, model=self.model)
@@ -101,13 +129,28 @@ class DiagnosisClassifier:
         return trainer.evaluate()
 
     def generate_disease_name(self, symptom_description):
+        return self.generate_disease_names([symptom_description])[0]
+
+    def generate_disease_names(self, symptom_descriptions):
+        # Inputs are padded to the longest description in the batch rather
+        # than to max_length, so short batches stay cheap
+        start = time.perf_counter()
         inputs = self.tokenizer(
-            symptom_description,
+            list(symptom_descriptions),
             return_tensors="pt",
             truncation=True,
-            padding="max_length",
+            padding="longest",
             max_length=128
         ).to(self.device)
-
-        outputs = self.model.generate(inputs["input_ids"])
-        return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        tokenized = time.perf_counter()
+
+        with torch.no_grad():
+            outputs = self.model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"])
+        generated = time.perf_counter()
+
+        names = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        if self.stage_observer is not None:
+            self.stage_observer("tokenize", tokenized - start)
+            self.stage_observer("generate", generated - tokenized)
+            self.stage_observer("decode", time.perf_counter() - generated)
+        return names
@@ -0,0 +1,115 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def normalize_symptoms(symptom_description):
+    # "Fever, cough,  fever" and "Cough, Fever" map to the same key
+    items = re.split(r"[,;\n]", symptom_description.lower())
+    items = {" ".join(item.split()) for item in items}
+    return ", ".join(sorted(item for item in items if item))
+
+
+class PredictionCache:
+    # In-memory LRU in front of a SQLite file that survives restarts. Entries
+    # are tagged with the model version and dropped when the version changes.
+    def __init__(self, path=None, max_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.model_version = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # _lock guards the in-memory LRU and counters only; the SQLite store
+        # has its own lock so lookups never wait behind a disk commit
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._store = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._store = sqlite3.connect(path, check_same_thread=False)
+            self._store.execute("PRAGMA journal_mode=WAL")
+            self._store.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "model_version TEXT NOT NULL, symptoms TEXT NOT NULL, disease TEXT NOT NULL, "
+                "PRIMARY KEY (model_version, symptoms))")
+            self._store.commit()
+
+    def set_model_version(self, model_version):
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            self._entries.clear()
+        if self._store is not None:
+            with self._store_lock:
+                self._store.execute("DELETE FROM predictions WHERE model_version <> ?", (model_version,))
+                self._store.commit()
+
+    def get(self, symptom_description, count_miss=True):
+        key = normalize_symptoms(symptom_description)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            model_version = self.model_version
+
+        row = None
+        if self._store is not None:
+            with self._store_lock:
+                row = self._store.execute(
+                    "SELECT disease FROM predictions WHERE model_version = ? AND symptoms = ?",
+                    (model_version, key)).fetchone()
+
+        with self._lock:
+            if row:
+                # A version change meanwhile makes the row stale
+                if model_version == self.model_version:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(self, symptom_description, disease):
+        key = normalize_symptoms(symptom_description)
+        with self._lock:
+            self._remember(key, disease)
+            model_version = self.model_version
+
+        # Rows of an older version left by a race with set_model_version are
+        # never read, and are deleted by the next version change
+        if self._store is not None:
+            with self._store_lock:
+                self._store.execute(
+                    "INSERT OR REPLACE INTO predictions (model_version, symptoms, disease) VALUES (?, ?, ?)",
+                    (model_version, key, disease))
+                self._store.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "model_version": self.model_version,
+            }
+
+    def _remember(self, key, disease):
+        self._entries[key] = disease
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
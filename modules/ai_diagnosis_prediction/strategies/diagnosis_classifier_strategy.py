@@ -2,11 +2,22 @@ from modules.ai_diagnosis_prediction.strategies.prediction_strategy import Predi
 from modules.ai_diagnosis_prediction.models.diagnosis_classifier import DiagnosisClassifier
 
 class DiagnosisClassifierStrategy(PredictionStrategy):
-    def __init__(self):
-        self.model = DiagnosisClassifier()
+    def __init__(self, inference_only=True):
+        # In inference-only mode nothing is loaded until load_model, which then
+        # reads just the trained checkpoint
+        self.model = None if inference_only else DiagnosisClassifier()
 
     def load_model(self, model_path):
-        self.model.load_model(model_path)
+        if self.model is None:
+            self.model = DiagnosisClassifier.for_inference(model_path)
+        else:
+            self.model.load_model(model_path)
+
+    def set_stage_observer(self, observer):
+        self.model.stage_observer = observer
 
     def generate_disease_name(self, symptom_description):
         return self.model.generate_disease_name(symptom_description)
+
+    def generate_disease_names(self, symptom_descriptions):
+        return self.model.generate_disease_names(symptom_descriptions)
@@ -8,3 +8,11 @@ class PredictionStrategy(ABC):
     @abstractmethod
     def generate_disease_name(self, symptom_description):
         pass
+
+    def set_stage_observer(self, observer):
+        # observer(stage, seconds) is told how long each inference stage took;
+        # strategies that cannot split their work into stages ignore it
+        pass
+
+    def generate_disease_names(self, symptom_descriptions):
+        return [self.generate_disease_name(description) for description in symptom_descriptions]
\ No newline at end of file
@@ -0,0 +1,15 @@
+from modules.ai_diagnosis_prediction.strategies.diagnosis_classifier_strategy import DiagnosisClassifierStrategy
+import torch
+
+class QuantizedDiagnosisClassifierStrategy(DiagnosisClassifierStrategy):
+    # Serves the trained checkpoint with its Linear layers dynamically
+    # quantized to int8. Dynamic quantization only runs on CPU.
+    def load_model(self, model_path):
+        super().load_model(model_path)
+
+        self.model.device = torch.device("cpu")
+        self.model.model = torch.quantization.quantize_dynamic(
+            self.model.model.to(self.model.device),
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
@@ -0,0 +1,10 @@
+from website import create_app
+
+
+# Dedicated process for the background jobs (one-hour reminders, unread
+# counter reconciliation). Run exactly one next to the web workers, which do
+# not run the jobs themselves.
+app = create_app({'SCHEDULER_ENABLED': False})
+
+if __name__ == '__main__':
+    app.scheduler.run_forever()
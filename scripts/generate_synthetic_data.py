@@ -0,0 +1,178 @@
+import argparse
+import csv
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from website.database_backends import bootstrap_schema
+
+SLOTS_PER_DAY = 24  # 30 minute slots between 8:00 and 20:00
+BATCH_SIZE = 20000
+DEFAULT_PASSWORD = 'Telemedix1!'
+
+
+def load_specializations(csv_path):
+    names = []
+    with open(csv_path, mode='r', encoding='latin-1') as file:
+        for row in csv.reader(file):
+            if len(row) == 2 and row[1].strip() not in names:
+                names.append(row[1].strip())
+    return names
+
+
+def slot_start(day, slot):
+    return day + datetime.timedelta(hours=8, minutes=30 * slot)
+
+
+def insert_batches(connection, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.executemany(sql, batch)
+            batch = []
+    if batch:
+        connection.executemany(sql, batch)
+
+
+def generate(connection, doctors, patients, appointments, days_back, days_ahead, free_slots, cancelled_ratio, seed):
+    rng = random.Random(seed)
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    first_day = today - datetime.timedelta(days=days_back)
+    total_days = days_back + days_ahead
+
+    password = generate_password_hash(DEFAULT_PASSWORD, method='pbkdf2:sha256')
+    specializations = load_specializations('Doctor_Versus_Disease.csv')
+    connection.executemany("INSERT INTO [Specialization] ([specializationID], [specialization_name]) VALUES (?, ?)",
+                           list(enumerate(specializations, start=1)))
+
+    def users():
+        for i in range(1, doctors + 1):
+            yield (i, f'doctor{i}@telemedix.local', password, f'Doctor {i:06d}', '1980-01-01', 3)
+        for i in range(1, patients + 1):
+            yield (doctors + i, f'patient{i}@telemedix.local', password, f'Patient {i:07d}', '1990-01-01', 2)
+
+    insert_batches(connection, "INSERT INTO [User] ([userID], [email], [password], [username], [birth_date], [roleID]) VALUES (?, ?, ?, ?, ?, ?)", users())
+    insert_batches(connection, "INSERT INTO [Medic] ([medicID], [specializationID], [licence_no]) VALUES (?, ?, ?)",
+                   ((i, rng.randint(1, len(specializations)), f'LIC{i:06d}') for i in range(1, doctors + 1)))
+    insert_batches(connection, "INSERT INTO [TimeTable] ([medicID], [mon], [tue], [wed], [thu], [fri], [sat], [sun]) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   ((i, '08:00-20:00', '08:00-20:00', '08:00-20:00', '08:00-20:00', '08:00-20:00', '', '') for i in range(1, doctors + 1)))
+    insert_batches(connection, "INSERT INTO [Pacient] ([pacientID]) VALUES (?)",
+                   ((doctors + i,) for i in range(1, patients + 1)))
+    insert_batches(connection, "INSERT INTO [MedicalRecord] ([recordID], [pacientID]) VALUES (?, ?)",
+                   ((i, doctors + i) for i in range(1, patients + 1)))
+
+    availability = []
+    appointment_rows = []
+    notifications = []
+    availability_id = 0
+    appointment_id = 0
+
+    def flush():
+        connection.executemany("INSERT INTO [Availability] ([availabilityID], [medicID], [date], [start_time], [end_time], [availability_status]) VALUES (?, ?, ?, ?, ?, ?)", availability)
+        connection.executemany("INSERT INTO [Appointment] ([appointmentID], [pacientID], [medicID], [appointment_date], [availabilityID], [serviceID], [notes], [status]) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", appointment_rows)
+        connection.executemany("INSERT INTO [Notification] ([user_id], [consultation_id], [message], [type], [read], [created_at]) VALUES (?, ?, ?, ?, ?, ?)", notifications)
+        availability.clear()
+        appointment_rows.clear()
+        notifications.clear()
+
+    # Appointments are spread evenly over each doctor's calendar, every one
+    # holding its own Availability slot; cancelled ones have released it
+    per_doctor, remainder = divmod(appointments, doctors)
+    for medic_id in range(1, doctors + 1):
+        count = per_doctor + (1 if medic_id <= remainder else 0)
+        step = max(1, (total_days * SLOTS_PER_DAY) // max(count, 1))
+        booked_slots = set()
+        for n in range(count):
+            index = min(n * step + rng.randrange(step), total_days * SLOTS_PER_DAY - 1)
+            while index in booked_slots:
+                index = (index + 1) % (total_days * SLOTS_PER_DAY)
+            booked_slots.add(index)
+            day = first_day + datetime.timedelta(days=index // SLOTS_PER_DAY)
+            start = slot_start(day, index % SLOTS_PER_DAY)
+            end = start + datetime.timedelta(minutes=30)
+            pacient_id = doctors + rng.randint(1, patients)
+            appointment_id += 1
+
+            cancelled = rng.random() < cancelled_ratio
+            if cancelled:
+                slot_id = None
+            else:
+                availability_id += 1
+                slot_id = availability_id
+                availability.append((slot_id, medic_id, day.date(), start, end, 'BOOKED'))
+
+            appointment_rows.append((appointment_id, pacient_id, medic_id, start, slot_id, 1, 'Generated consultation', 'CANCELLED' if cancelled else 'BOOKED'))
+            notifications.append((medic_id, appointment_id, f"New consultation scheduled by Patient {pacient_id - doctors:07d} for {start.strftime('%Y-%m-%d %H:%M')}.", 'created', int(start < today), start - datetime.timedelta(days=1)))
+
+        # Free future slots, skipping the ones already booked
+        future_index = days_back * SLOTS_PER_DAY
+        added = 0
+        while added < free_slots and future_index < total_days * SLOTS_PER_DAY:
+            if future_index not in booked_slots:
+                day = first_day + datetime.timedelta(days=future_index // SLOTS_PER_DAY)
+                start = slot_start(day, future_index % SLOTS_PER_DAY)
+                availability_id += 1
+                availability.append((availability_id, medic_id, day.date(), start, start + datetime.timedelta(minutes=30), 'FREE'))
+                added += 1
+            future_index += 1
+
+        if len(appointment_rows) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    # Every user gets the unread counter that sign-up creates
+    connection.execute(
+        "INSERT INTO [NotificationCounter] ([user_id], [unread_count]) "
+        "SELECT [userID], (SELECT COUNT(*) FROM [Notification] n WHERE n.[user_id] = [User].[userID] AND n.[read] = 0 AND n.[deleted] = 0) FROM [User]")
+    connection.commit()
+    return appointment_id, availability_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a SQLite Telemedix database with synthetic doctors, patients and appointments")
+    parser.add_argument('--path', default='instance/telemedix.sqlite3')
+    parser.add_argument('--doctors', type=int, default=1000)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--days-back', type=int, default=730)
+    parser.add_argument('--days-ahead', type=int, default=30)
+    parser.add_argument('--free-slots', type=int, default=48, help="free future slots per doctor")
+    parser.add_argument('--cancelled-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="delete the database file if it exists")
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        if not args.force:
+            parser.error(f"{args.path} already exists, use --force to replace it")
+        os.remove(args.path)
+    directory = os.path.dirname(args.path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(args.path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=OFF")
+    bootstrap_schema(connection)
+
+    start = time.perf_counter()
+    appointment_count, availability_count = generate(
+        connection, args.doctors, args.patients, args.appointments, args.days_back,
+        args.days_ahead, args.free_slots, args.cancelled_ratio, args.seed)
+    connection.execute("ANALYZE")
+    connection.close()
+
+    print(f"Generated {args.doctors} doctors, {args.patients} patients, {appointment_count} appointments "
+          f"and {availability_count} availability slots in {time.perf_counter() - start:.1f}s")
+    print(f"Every user's password is {DEFAULT_PASSWORD}")
+
+
+if __name__ == '__main__':
+    main()
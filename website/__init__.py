@@ -1,12 +1,51 @@
-from flask import Flask, current_app
+from flask import Flask
 from flask_login import LoginManager, current_user
-import pyodbc
 from .models import User
-from .database_connection import DatabaseConnection  
+from .database_connection import DatabaseConnection
+from .database_backends import SqlServerBackend, SqliteBackend
+from .user_cache import UserCache
+from .scheduler import Scheduler
+from .slot_index import SlotIndex
+from .reference_cache import ReferenceCache
+from .sql_trace import SqlTracer, sql_debug
+from .metrics import metrics, registry as metrics_registry
 
-def create_app():
+def create_database_backend(config):
+    # FLASK_DATABASE_BACKEND=sqlite runs against a local file instead of Azure SQL
+    if config['DATABASE_BACKEND'] == 'sqlite':
+        return SqliteBackend(config['SQLITE_PATH'])
+    return SqlServerBackend(
+        server='tcp:telemedixdb.database.windows.net,1433',
+        database='telemedixDB',
+        username='telemedix',
+        password='ProiectMOPS!',
+    )
+
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'hjshjhdjah kjshkjdhjs'
+    app.config['DATABASE_BACKEND'] = 'mssql'
+    app.config['SQLITE_PATH'] = 'instance/telemedix.sqlite3'
+    app.config['DB_POOL_SIZE'] = 10
+    app.config['USER_CACHE_TTL'] = 30
+    app.config['UNREAD_RECONCILE_INTERVAL'] = 600
+    app.config['REMINDER_INTERVAL'] = 60
+    app.config['SCHEDULER_ENABLED'] = False
+    app.config['SLOT_INDEX_REFRESH_INTERVAL'] = 300
+    app.config['REFERENCE_CACHE_TTL'] = 300
+    # Request bodies above this are refused with 413 before they are spooled;
+    # it leaves room for a MAX_PDF_BYTES upload plus the multipart framing
+    app.config['MAX_CONTENT_LENGTH'] = 6 * 1024 * 1024
+    # Seconds a /diagnosis request waits for its model batch before giving up
+    app.config['DIAGNOSIS_PREDICT_TIMEOUT'] = 60
+    app.config['SQL_TRACE'] = False
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = 3
+    # Bearer token Prometheus sends to /metrics; without one the endpoint is
+    # only served in debug mode
+    app.config['METRICS_TOKEN'] = None
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
 
     from .views import views
     from .auth import auth
@@ -14,7 +53,7 @@ def create_app():
     from .generate_diagnosis import diagnosis
     from .doctors import doctor
     from .consultations import consultation
-    from .notifications import notifications
+    from .notifications import notifications, get_unread_count, reconcile_unread_counts, generate_one_hour_notifications
 
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(auth, url_prefix='/')
@@ -24,24 +63,42 @@ def create_app():
     app.register_blueprint(consultation, url_prefix='/')
     app.register_blueprint(notifications, url_prefix='/')
 
-    db_instance = DatabaseConnection(
-        server='tcp:telemedixdb.database.windows.net,1433',
-        database='telemedixDB',
-        username='telemedix',
-        password='ProiectMOPS!',
-    )
-    app.db = db_instance.get_connection()
+    db_instance = DatabaseConnection(create_database_backend(app.config))
+    # app.db hands every request its own connection from a bounded pool
+    app.db = db_instance.get_pooled_connection(max_size=app.config['DB_POOL_SIZE'])
+    app.db.init_app(app)
+
+    # Request, SQL and inference latencies, exported with pool and cache
+    # figures at /metrics for Prometheus
+    metrics_registry.init_app(app)
+    app.register_blueprint(metrics, url_prefix='/')
+
+    # FLASK_SQL_TRACE=true records the statements of every request, reports
+    # them in X-SQL-* headers and serves the last ones at /debug/sql
+    if app.config['SQL_TRACE']:
+        app.sql_tracer = SqlTracer(app, threshold=app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+        app.db.tracer = app.sql_tracer
+        app.register_blueprint(sql_debug, url_prefix='/')
 
     loginManager = LoginManager()
     loginManager.login_view = 'auth.login'
     loginManager.init_app(app)
 
+    # Saves the [User] lookup on most authenticated requests; edit_account and
+    # delete_account invalidate the entry of the user they change
+    app.user_cache = UserCache(ttl=app.config['USER_CACHE_TTL'])
+
     @loginManager.user_loader
     def load_user(id):
-        conn = app.db
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM [User] WHERE userid = ?", id)
-        user = cursor.fetchone()
+        user = app.user_cache.get(str(id))
+        if user is None:
+            conn = app.db
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM [User] WHERE userid = ?", id)
+            user = cursor.fetchone()
+            if user:
+                user = tuple(user)
+                app.user_cache.set(str(id), user)
         if user:
             return User(userid=user[0],
                         email=user[1],
@@ -51,16 +108,27 @@ def create_app():
                         roleid=user[5])
         return None
 
+    # Free availability slots for /get-slots and the earliest-slot search,
+    # loaded on first use and rebuilt when older than the refresh interval
+    app.slot_index = SlotIndex(refresh_interval=app.config['SLOT_INDEX_REFRESH_INTERVAL'])
+
+    # Query results from slow-changing tables such as the doctors of each
+    # specialization; writers call app.reference_cache.invalidate(table)
+    app.reference_cache = ReferenceCache(ttl=app.config['REFERENCE_CACHE_TTL'])
+
     @app.context_processor
     def inject_unread_count():
         if current_user.is_authenticated:
-            conn = current_app.db
-            cursor = conn.cursor()
+            return {'unread_count': get_unread_count(current_user.userid)}
+        return {'unread_count': 0}
+
+    # Background jobs run in scheduler_worker.py, one process for the whole
+    # deployment. FLASK_SCHEDULER_ENABLED=true runs them in a thread of this
+    # process instead, which is only safe with a single web worker.
+    app.scheduler = Scheduler(app)
+    app.scheduler.add_job('one_hour_reminders', generate_one_hour_notifications, app.config['REMINDER_INTERVAL'])
+    app.scheduler.add_job('reconcile_unread_counts', reconcile_unread_counts, app.config['UNREAD_RECONCILE_INTERVAL'])
+    if app.config['SCHEDULER_ENABLED']:
+        app.scheduler.start()
 
-            # Count unread notifications for the logged-in user
-            unread_count = cursor.execute(
-                "SELECT COUNT(*) FROM Notification WHERE user_id = ? AND [read] = 0",
-                (current_user.userid,)).fetchone()[0]
-            return {'unread_count': unread_count}
-        return {'unread_count': 0}  
     return app
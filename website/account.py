@@ -63,6 +63,10 @@ def edit_account():
                     cursor.execute("UPDATE [User] SET username = ?, email = ?, birth_date = ? WHERE userID = ?", name, email, birth_date, current_user.userid)
                 
                 conn.commit()
+                current_app.user_cache.invalidate(str(current_user.userid))
+                if current_user.roleid == 3:
+                    # Doctor names appear in the cached doctor lists
+                    current_app.reference_cache.invalidate('User')
 
                 updatedUser = cursor.execute("SELECT * FROM [User] WHERE userID = ?", current_user.userid).fetchone()
                 
@@ -101,6 +105,9 @@ def delete_account():
 
         cursor.execute("DELETE FROM [User] WHERE userID = ?", current_user.userid)
         conn.commit()
+        current_app.user_cache.invalidate(str(current_user.userid))
+        if current_user.roleid == 3:
+            current_app.reference_cache.invalidate('User', 'Medic')
         logout_user()
         flash("Account deleted successfully.", category="success")
         return redirect(url_for('auth.login'))
@@ -3,7 +3,8 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import re
 from flask_login import login_user, login_required, logout_user, current_user
 from .models import User
-from .notifications import generate_one_hour_notifications
+from .reference_data import get_role, get_roles
+from .notifications import create_unread_counter
 
 
 auth = Blueprint('auth', __name__)
@@ -57,12 +58,14 @@ def sign_up():
         else:
             hashedPassword = generate_password_hash(password, method='pbkdf2:sha256')
             cursor.execute("INSERT INTO [User] (username, email, password, birth_date, roleid) VALUES (?, ?, ?, ?, ?)", name, email, hashedPassword, birthDate, roleId)
-            conn.commit()
 
+            # The user and their unread counter are written in one transaction
             newUser = cursor.execute("SELECT * FROM [User] WHERE email = ?", email).fetchone()
+            create_unread_counter(cursor, newUser.userID)
+            conn.commit()
             
             if(newUser.roleID == 2): # Pacient
-                cursor.execute("INSERT INTO [MedicalRecord] VALUES (?)", newUser.userID)
+                cursor.execute("INSERT INTO [MedicalRecord] ([pacientID]) VALUES (?)", newUser.userID)
                 conn.commit()
 
             activeUser = User(userid=newUser.userID,
@@ -72,10 +75,11 @@ def sign_up():
                               birth_date=newUser.birth_date,
                               roleid = newUser.roleID)
             
-            role = cursor.execute("SELECT * FROM Role WHERE roleID = ?", roleId).fetchone()
+            role = get_role(roleId)
             if role.role_name == 'DOCTOR':
                 cursor.execute("INSERT INTO [Medic] (medicID) VALUES (?)", newUser.userID)
                 conn.commit()
+                current_app.reference_cache.invalidate('Medic')
             elif role.role_name == 'PATIENT':
                 cursor.execute("INSERT INTO [Pacient] (pacientID) VALUES (?)", newUser.userID)
                 conn.commit()
@@ -84,7 +88,7 @@ def sign_up():
             flash("Account created", category="success")
             return redirect(url_for('views.home'))
 
-    roles = current_app.db.cursor().execute("SELECT * FROM Role WHERE roleID != 1").fetchall()
+    roles = [role for role in get_roles() if role.roleID != 1]
     return render_template("sign_up.html", user=current_user, roles=roles)
 
 
@@ -112,7 +116,6 @@ def login():
                                   roleid=user.roleID)
                 
                 login_user(activeUser, remember=True)
-                generate_one_hour_notifications()
                 return redirect(url_for('views.home'))
             else:
                 flash("Incorrect password, try again", category="error")
@@ -0,0 +1,87 @@
+import bisect
+import datetime
+from flask import current_app
+
+SLOT_LENGTH = datetime.timedelta(minutes=30)
+TIMETABLE_DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+class SlotOverlap(Exception):
+    def __init__(self, start_time, end_time, existing_start, existing_end):
+        super().__init__(f'Slot {start_time.time()} - {end_time.time()} overlaps with an existing slot ({existing_start.time()} - {existing_end.time()}).')
+        self.start_time = start_time
+        self.end_time = end_time
+
+def consecutive_slots(first_start, count):
+    return [(first_start + i * SLOT_LENGTH, first_start + (i + 1) * SLOT_LENGTH) for i in range(count)]
+
+def parse_interval(interval):
+    # 'HH:MM-HH:MM' from the TimeTable, None for an empty or malformed day
+    try:
+        start, end = interval.split('-')
+        start = datetime.datetime.strptime(start.strip(), '%H:%M').time()
+        end = datetime.datetime.strptime(end.strip(), '%H:%M').time()
+    except (AttributeError, ValueError):
+        return None
+    return (start, end) if start < end else None
+
+def timetable_slots(timetable, first_day, weeks):
+    # 30-minute slots covering the doctor's weekly working hours for the given
+    # number of weeks, starting on first_day; slots already in the past are left out
+    intervals = [parse_interval(getattr(timetable, day)) for day in TIMETABLE_DAYS]
+    now = datetime.datetime.now()
+    slots = []
+    for offset in range(weeks * 7):
+        day = first_day + datetime.timedelta(days=offset)
+        interval = intervals[day.weekday()]
+        if interval is None:
+            continue
+        start = datetime.datetime.combine(day, interval[0])
+        day_end = datetime.datetime.combine(day, interval[1])
+        while start + SLOT_LENGTH <= day_end:
+            if start > now:
+                slots.append((start, start + SLOT_LENGTH))
+            start += SLOT_LENGTH
+    return slots
+
+def create_availability_slots(medic_id, slots, skip_overlaps=False):
+    # Checks the whole requested window against the doctor's existing slots
+    # with one range query and inserts everything in one transaction. An
+    # overlap raises SlotOverlap, unless skip_overlaps drops those slots
+    # instead (used when filling weeks from the timetable).
+    if not slots:
+        return []
+    slots = sorted(slots)
+
+    conn = current_app.db
+    cursor = conn.cursor()
+    try:
+        existing = cursor.execute(
+            'SELECT [start_time], [end_time] FROM [Availability] WHERE [medicID] = ? AND [start_time] < ? AND [end_time] > ? ORDER BY [start_time]',
+            medic_id, slots[-1][1], slots[0][0]).fetchall()
+        existing_starts = [slot.start_time for slot in existing]
+
+        created = []
+        for start_time, end_time in slots:
+            # Only the existing slot starting right before end_time can overlap,
+            # since a doctor's slots never overlap each other
+            index = bisect.bisect_left(existing_starts, end_time) - 1
+            if index >= 0 and existing[index].end_time > start_time:
+                if skip_overlaps:
+                    continue
+                raise SlotOverlap(start_time, end_time, existing[index].start_time, existing[index].end_time)
+            created.append({'date': start_time.date(), 'start_time': start_time, 'end_time': end_time, 'availability_status': 'FREE'})
+
+        if created:
+            if conn.dialect == 'mssql':
+                cursor.fast_executemany = True
+            cursor.executemany(
+                'INSERT INTO [Availability] ([date], [start_time], [end_time], [medicID], [availability_status]) VALUES (?, ?, ?, ?, ?)',
+                [(slot['date'], slot['start_time'], slot['end_time'], medic_id, 'FREE') for slot in created])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if created:
+        current_app.slot_index.refresh_doctor(medic_id)
+    return created
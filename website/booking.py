@@ -0,0 +1,68 @@
+from datetime import datetime
+from flask import current_app
+from .notifications import insert_consultation_notification
+
+class SlotUnavailable(Exception):
+    pass
+
+# The slot is claimed only if it is still FREE, and both statements hand back
+# what the next step needs (OUTPUT on Azure SQL, RETURNING on SQLite) instead
+# of reading it again with a separate SELECT
+CLAIM_SLOT_SQL = {
+    'mssql': """
+        UPDATE [Availability] SET [availability_status] = 'BOOKED'
+        OUTPUT INSERTED.[start_time]
+        WHERE [availabilityID] = ? AND [medicID] = ? AND [availability_status] = 'FREE' AND [start_time] > ?
+        """,
+    'sqlite': """
+        UPDATE [Availability] SET [availability_status] = 'BOOKED'
+        WHERE [availabilityID] = ? AND [medicID] = ? AND [availability_status] = 'FREE' AND [start_time] > ?
+        RETURNING [start_time]
+        """,
+}
+
+INSERT_APPOINTMENT_SQL = {
+    'mssql': """
+        INSERT INTO [Appointment] ([pacientID], [medicID], [appointment_date], [notes], [serviceID], [availabilityID])
+        OUTPUT INSERTED.[appointmentID]
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+    'sqlite': """
+        INSERT INTO [Appointment] ([pacientID], [medicID], [appointment_date], [notes], [serviceID], [availabilityID])
+        VALUES (?, ?, ?, ?, ?, ?)
+        RETURNING [appointmentID]
+        """,
+}
+
+def book_consultation(pacient_id, medic_id, availability_id, notes, patient_name, service_id=1):
+    # Claims the slot, creates the appointment and notifies the doctor in a
+    # single transaction. Two patients racing for the same slot cannot both
+    # succeed: the second conditional UPDATE finds it BOOKED and raises.
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    try:
+        slot = cursor.execute(CLAIM_SLOT_SQL[conn.dialect], (availability_id, medic_id, datetime.now())).fetchone()
+        if not slot:
+            raise SlotUnavailable("The selected slot is no longer available.")
+        appointment_date = slot[0]
+
+        appointment_id = cursor.execute(
+            INSERT_APPOINTMENT_SQL[conn.dialect],
+            (pacient_id, medic_id, appointment_date, notes, service_id, availability_id)).fetchone()[0]
+
+        insert_consultation_notification(cursor, medic_id, appointment_id, patient_name, appointment_date)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # The booking is committed at this point; a failure to update the slot
+    # index only delays the slot's removal until the next index refresh
+    slot_index = getattr(current_app, 'slot_index', None)
+    if slot_index is not None:
+        try:
+            slot_index.remove_slot(availability_id, medic_id, appointment_date)
+        except Exception as e:
+            print(f"Error updating the slot index after booking {appointment_id}: {e}")
+    return appointment_id, appointment_date
@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
-from .notifications import create_consultation_notification, create_cancellation_notification
+from .notifications import insert_cancellation_notification
+from .booking import book_consultation, SlotUnavailable
+from .database_backends import limit_rows
+from .reference_data import doctor_directory, get_doctor, get_specialization, get_specializations
 
 consultation = Blueprint('consultation', __name__)
 
@@ -14,72 +17,43 @@ def add_consultation():
 
     if request.method == 'POST':
         if not doctorID and not specializationID:
-            specializationId = request.form.get('specialization')
             doctorId = request.form.get('doctor')
-            appointmentDate = request.form.get('appointmentDate')
             notes = request.form.get('notes')
             slotid = request.form.get('slot')
-            conn = current_app.db
-            cursor = conn.cursor()
 
-            start_time = cursor.execute("SELECT [start_time] FROM [Availability] WHERE [availabilityID] = ?", int(slotid)).fetchone()
-            
-            # Convert appointment_date to a datetime object
             try:
-                appointment_date = datetime.strptime(f"{appointmentDate} {start_time[0].strftime('%H:%M')}",'%Y-%m-%d %H:%M')
-            except ValueError:
-                flash("Invalid date format", category="error")
-                return redirect(url_for('consultation.add_consultation'))
-
-            if appointment_date < datetime.strptime(datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d'):
-                flash("The date must be in the future", category="error")
-                return redirect(url_for('consultation.add_consultation'))
-
-            print(current_user.userid, doctorId, specializationId, appointment_date, notes)
+                medic_id = int(doctorId)
+                availability_id = int(slotid)
+            except (TypeError, ValueError):
+                flash("Please select a doctor and an available slot", category="error")
+                return redirect(url_for('views.consultation_form'))
 
-            cursor.execute("INSERT INTO [Appointment] ([pacientID], [medicID], [appointment_date], [notes], [serviceID], [availabilityID]) VALUES (?, ?, ?, ?, ?, ?)", current_user.userid, doctorId, appointment_date, notes, 1, int(slotid))
-            conn.commit()
-
-            cursor.execute("UPDATE [Availability] SET [availability_status] = 'BOOKED' WHERE [availabilityID] = ?", int(slotid))
-            conn.commit()
-            
-            # Add Notification
-            consultation_id = cursor.execute(
-                """
-                SELECT TOP 1 [appointmentID] 
-                FROM [Appointment] 
-                WHERE [pacientID] = ? AND [medicID] = ? AND [appointment_date] = ? 
-                ORDER BY [appointmentID] DESC
-                """,
-                (current_user.userid, doctorId, appointment_date)).fetchone()[0]
-            create_consultation_notification(
-                medic_id=doctorId,
-                consultation_id=consultation_id,
-                patient_name=current_user.username,
-                appointment_datetime=appointment_date)
+            # The slot's start time becomes the appointment date
+            try:
+                book_consultation(
+                    pacient_id=current_user.userid,
+                    medic_id=medic_id,
+                    availability_id=availability_id,
+                    notes=notes,
+                    patient_name=current_user.username)
+            except SlotUnavailable as e:
+                flash(f"{e} Please choose another slot.", category="error")
+                return redirect(url_for('views.consultation_form'))
             
             flash("Your consultation form was completed successfully", category="success")
             return redirect(url_for('views.home'))
         else: 
-            conn = current_app.db
-            cursor = conn.cursor()
-
             # Fetch the specialization and doctor based on the IDs
-            selected_specialization = cursor.execute("SELECT * FROM [Specialization] WHERE [specializationID] = ?", specializationID).fetchone()
-            selected_doctor = cursor.execute("""
-                SELECT m.*, u.username
-                FROM [Medic] m
-                JOIN [User] u ON m.medicID = u.userID
-                WHERE m.medicID = ?
-            """, (doctorID,)).fetchone()
+            selected_specialization = get_specialization(specializationID)
+            selected_doctor = get_doctor(doctorID)
 
             # If either the specialization or doctor doesn't exist, return an error
             if not selected_specialization or not selected_doctor:
                 flash("Invalid specialization or doctor ID", category="error")
                 return redirect(url_for('consultation.add_consultation'))
 
-            specializations = cursor.execute("SELECT * FROM [Specialization]").fetchall()
-            doctors = cursor.execute("SELECT * FROM [Medic]").fetchall()
+            specializations = get_specializations()
+            doctors = doctor_directory()[0]
 
             # Render the template with the selected specialization and doctor pre-filled
             return render_template("/consultations/consultation_form.html", 
@@ -89,37 +63,100 @@ def add_consultation():
                                 selected_specialization=selected_specialization, 
                                 selected_doctor=selected_doctor)
 
-    specializations = current_app.db.cursor().execute("SELECT * FROM [Specialization]").fetchall()
+    specializations = get_specializations()
     return render_template("consultation_form.html", user=current_user, specializations=specializations)
 
-def retrieve_medic_consultations(order, user_id):
+CONSULTATIONS_PAGE_SIZE = 20
+
+# Status is derived in SQL so that filtering happens before rows leave the
+# database; the ? placeholders are the current time
+CONSULTATION_STATUS_SQL = """
+    CASE
+        WHEN [Appointment].[status] = 'CANCELLED' THEN 'Cancelled'
+        WHEN [Appointment].[appointment_date] >= ? THEN 'Active'
+        ELSE 'Attended'
+    END"""
+
+# Each status filter is a WHERE fragment; Active and Attended compare against
+# the current time
+CONSULTATION_STATUS_FILTERS = {
+    'Active': ("[Appointment].[status] = 'BOOKED' AND [Appointment].[appointment_date] >= ?", True),
+    'Cancelled': ("[Appointment].[status] = 'CANCELLED'", False),
+    'Attended': ("[Appointment].[status] = 'BOOKED' AND [Appointment].[appointment_date] < ?", True),
+}
+
+def encode_consultations_cursor(appointment):
+    return f"{appointment.appointment_date.isoformat()}_{appointment.appointmentID}"
+
+def decode_consultations_cursor(cursor_value):
+    try:
+        appointment_date, appointment_id = cursor_value.rsplit('_', 1)
+        return datetime.fromisoformat(appointment_date), int(appointment_id)
+    except (AttributeError, ValueError):
+        return None
+
+def retrieve_consultations(user_id, role_id, order, status_filter=None, after=None, page_size=CONSULTATIONS_PAGE_SIZE):
+    # One page of a patient's or doctor's consultations, in keyset order on
+    # (appointment_date, appointmentID) so the cost of a page does not grow
+    # with the length of the history
     conn = current_app.db
     cursor = conn.cursor()
-    query = """
-                SELECT 
-                [appointmentID], 
-                [appointment_date], 
-                [notes], 
-                [username], 
-                [specialization_name],
-                [Appointment].[pacientID]
-            FROM 
+    now = datetime.now()
+    descending = order == 'desc'
+
+    if role_id == 3:
+        counterpart_join = "JOIN [User] ON [Appointment].[pacientID] = [User].[userID]"
+        owner_column = "[Appointment].[medicID]"
+    else:
+        counterpart_join = "JOIN [User] ON [Appointment].[medicID] = [User].[userID]"
+        owner_column = "[Appointment].[pacientID]"
+
+    conditions = [f"{owner_column} = ?"]
+    params = [now, user_id]
+
+    if status_filter in CONSULTATION_STATUS_FILTERS:
+        condition, uses_now = CONSULTATION_STATUS_FILTERS[status_filter]
+        conditions.append(condition)
+        if uses_now:
+            params.append(now)
+
+    if after:
+        comparison = '<' if descending else '>'
+        conditions.append(
+            f"([Appointment].[appointment_date] {comparison} ? OR "
+            f"([Appointment].[appointment_date] = ? AND [Appointment].[appointmentID] {comparison} ?))")
+        params.extend([after[0], after[0], after[1]])
+
+    direction = 'DESC' if descending else 'ASC'
+    query = f"""
+            SELECT
+                [Appointment].[appointmentID],
+                [Appointment].[appointment_date],
+                [Appointment].[notes],
+                [Appointment].[cancellation_reason],
+                [User].[username],
+                [Specialization].[specialization_name],
+                [Appointment].[pacientID],
+                {CONSULTATION_STATUS_SQL} AS [status]
+            FROM
                 [Appointment]
-            JOIN 
-                [Pacient] ON [Appointment].[pacientID] = [Pacient].[pacientID]
-            JOIN 
-                [User] ON [Pacient].[pacientID] = [User].[userID]
-            JOIN 
+            {counterpart_join}
+            JOIN
                 [Medic] ON [Appointment].[medicID] = [Medic].[medicID]
-            JOIN 
+            LEFT JOIN
                 [Specialization] ON [Medic].[specializationID] = [Specialization].[specializationID]
-            WHERE 
-                [Appointment].[medicID] = ?
-            ORDER BY 
-                [appointment_date] {} """.format('DESC' if order == 'desc' else 'ASC')
-                
-    appointments = cursor.execute(query, (user_id,)).fetchall()
-    return(appointments)
+            WHERE
+                {' AND '.join(conditions)}
+            ORDER BY
+                [Appointment].[appointment_date] {direction}, [Appointment].[appointmentID] {direction}"""
+
+    # One extra row tells whether there is a next page
+    appointments = cursor.execute(limit_rows(query, page_size + 1, conn.dialect), params).fetchall()
+    next_cursor = None
+    if len(appointments) > page_size:
+        appointments = appointments[:page_size]
+        next_cursor = encode_consultations_cursor(appointments[-1])
+    return appointments, next_cursor
 
 @consultation.route('/my-consultations', methods=['GET'])
 @login_required
@@ -127,53 +164,15 @@ def get_consultations():
     appointment_id = request.args.get('appointment_id')
     status_appointment = request.args.get('status_appointment')
 
-    conn = current_app.db
-    cursor = conn.cursor()
-    
     status_filter = request.args.get('status')
     order = request.args.get('order', 'desc')
-    user_id = current_user.userid
-    
-    if current_user.roleid == 2: # Retrieve patient's consultations  
-        query = """
-                SELECT 
-                [appointmentID], 
-                [appointment_date], 
-                [notes], 
-                [username], 
-                [specialization_name],
-                [pacientID]
-            FROM 
-                [Appointment]
-            JOIN 
-                [Medic] ON [Appointment].[medicID] = [Medic].[medicID]
-            JOIN 
-                [User] ON [Medic].[medicID] = [User].[userID]
-            JOIN 
-                [Specialization] ON [Medic].[specializationID] = [Specialization].[specializationID]
-            WHERE 
-                [Appointment].[pacientID] = ?
-            ORDER BY 
-                [appointment_date] {} """.format('DESC' if order == 'desc' else 'ASC')
-                   
-        appointments = cursor.execute(query, (user_id,)).fetchall() 
-        
-    elif current_user.roleid == 3:
-        appointments = retrieve_medic_consultations(order, user_id)
-    
-    now = datetime.now()
-    processed_appointments = []
+    after = decode_consultations_cursor(request.args.get('after'))
 
-    for appointment in appointments:
-        
-        # Determine status
-        if appointment.appointment_date >= now and "Cancellation Reason:" not in appointment.notes:
-            status = "Active"
-        elif "Cancellation Reason:" in appointment.notes:
-            status = "Cancelled"
-        else:
-            status = "Attended"
+    appointments, next_cursor = retrieve_consultations(current_user.userid, current_user.roleid, order, status_filter, after)
 
+    processed_appointments = []
+    for appointment in appointments:
+        status = appointment.status
         if appointment_id and appointment.appointmentID == int(appointment_id):
             status = status_appointment
 
@@ -181,17 +180,14 @@ def get_consultations():
             "appointmentID": appointment.appointmentID,
             "appointment_date": appointment.appointment_date,
             "notes": appointment.notes,
+            "cancellation_reason": appointment.cancellation_reason,
             "username": appointment.username,
             "specialization_name": appointment.specialization_name,
             "status": status,
             "pacientID": appointment.pacientID
         })
-    
-    if status_filter:
-        processed_appointments = [
-            appt for appt in processed_appointments if appt["status"] == status_filter
-        ]
-    return render_template("consultations/my_consultations.html", appointments=processed_appointments,  status_filter=status_filter, order=order)
+
+    return render_template("consultations/my_consultations.html", appointments=processed_appointments,  status_filter=status_filter, order=order, next_cursor=next_cursor, paginated=after is not None)
 
 
 @consultation.route('/cancel-consultation/<int:appointment_id>', methods=['POST'])
@@ -204,7 +200,7 @@ def cancel_consultation(appointment_id):
 
     # Verify the consultation belongs to the current user and is in the future
     consultation = cursor.execute(
-         "SELECT [appointment_date], [notes], [medicID], [pacientID], [appointmentID] FROM [Appointment] WHERE [appointmentID] = ? AND ([pacientID] = ? OR [medicID] = ?)", 
+         "SELECT [appointment_date], [status], [medicID], [pacientID], [appointmentID], [availabilityID] FROM [Appointment] WHERE [appointmentID] = ? AND ([pacientID] = ? OR [medicID] = ?)", 
         (appointment_id, current_user.userid, current_user.userid)).fetchone()
 
     if consultation:
@@ -214,12 +210,15 @@ def cancel_consultation(appointment_id):
         return redirect(url_for('consultation.get_consultations'))
 
     appointment_date = consultation['appointment_date']
-    notes = consultation['notes'] or ""
 
     if appointment_date < datetime.now():
         flash("Cannot cancel past consultations.", category="error")
         return redirect(url_for('consultation.get_consultations'))
 
+    if consultation['status'] == 'CANCELLED':
+        flash("Consultation is already cancelled.", category="error")
+        return redirect(url_for('consultation.get_consultations'))
+
     #Add Notification
     medic_id = consultation['medicID']
     patient_id = consultation['pacientID']
@@ -231,25 +230,38 @@ def cancel_consultation(appointment_id):
     elif current_user.userid == patient_id:
         recipient_id = medic_id
         canceler_name = f"Patient {current_user.username}"
-    create_cancellation_notification(
-        recipient_id=recipient_id,
-        consultation_id=consultation_id,
-        canceler_name=canceler_name,
-        cancellation_reason=cancellation_reason,
-        consultation_date = appointment_date)
-
-    # Append cancellation reason to notes  
-    updated_notes = f"{notes}\n\n -Cancellation Reason: {cancellation_reason}" if cancellation_reason else f"{notes}\n\nCancellation Reason: -"
-    cursor.execute(
-        "UPDATE [Appointment] SET [notes] = ? WHERE [appointmentID] = ?", 
-        (updated_notes, appointment_id))
-    conn.commit()
-    
-    availability_id = cursor.execute("SELECT [availabilityID] FROM [Appointment] WHERE [appointmentID] = ?", appointment_id).fetchone()
-    cursor.execute("UPDATE [Appointment] SET [availabilityID] = NULL WHERE [appointmentID] = ?", appointment_id)
-    conn.commit()
-    cursor.execute("UPDATE [Availability] SET [availability_status] = 'FREE' WHERE [availabilityID] = ?", availability_id)
-    conn.commit()
+
+    # Mark the consultation cancelled, free its slot and notify the other
+    # participant in one transaction. Only the request whose UPDATE still
+    # finds the consultation BOOKED goes on; a concurrent cancel stops here.
+    try:
+        cursor.execute(
+            "UPDATE [Appointment] SET [status] = 'CANCELLED', [cancellation_reason] = ?, [cancelled_at] = ?, [availabilityID] = NULL WHERE [appointmentID] = ? AND [status] = 'BOOKED'", 
+            (cancellation_reason or None, datetime.now(), appointment_id))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            flash("Consultation is already cancelled.", category="error")
+            return redirect(url_for('consultation.get_consultations'))
+
+        if consultation['availabilityID'] is not None:
+            cursor.execute("UPDATE [Availability] SET [availability_status] = 'FREE' WHERE [availabilityID] = ?", consultation['availabilityID'])
+        insert_cancellation_notification(
+            cursor,
+            recipient_id=recipient_id,
+            consultation_id=consultation_id,
+            canceler_name=canceler_name,
+            cancellation_reason=cancellation_reason,
+            consultation_date=appointment_date)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if consultation['availabilityID'] is not None:
+        try:
+            current_app.slot_index.refresh_doctor(medic_id)
+        except Exception as e:
+            print(f"Error updating the slot index after cancelling {appointment_id}: {e}")
 
     
     flash("Consultation cancelled successfully.", category="success")
@@ -262,7 +274,7 @@ def delete_consultation(appointment_id):
     cursor = conn.cursor()
 
     consultation = cursor.execute(
-         "SELECT [appointment_date], [notes] FROM [Appointment] WHERE [appointmentID] = ? AND ([pacientID] = ? OR [medicID] = ?)", 
+         "SELECT [appointment_date], [status] FROM [Appointment] WHERE [appointmentID] = ? AND ([pacientID] = ? OR [medicID] = ?)", 
         (appointment_id, current_user.userid, current_user.userid)).fetchone()
 
     if consultation:
@@ -272,10 +284,9 @@ def delete_consultation(appointment_id):
         return redirect(url_for('consultation.get_consultations'))
 
     appointment_date = consultation['appointment_date']
-    notes = consultation['notes'] or ""
 
     # Check if consultation is eligible for deletion
-    if appointment_date >= datetime.now() and "Cancellation Reason:" not in notes:
+    if appointment_date >= datetime.now() and consultation['status'] != 'CANCELLED':
         flash("Only past or cancelled consultations can be deleted.", category="error")
         return redirect(url_for('consultation.get_consultations'))
 
@@ -293,7 +304,7 @@ def edit_notes(appointment_id):
     cursor = conn.cursor()
 
     appointment = cursor.execute(
-        "SELECT [notes], [appointment_date], [pacientID] FROM [Appointment] WHERE [appointmentID] = ?", 
+        "SELECT [status], [appointment_date], [pacientID] FROM [Appointment] WHERE [appointmentID] = ?", 
         (appointment_id,)).fetchone()
     
     if not appointment or appointment[2] != current_user.userid:
@@ -302,7 +313,7 @@ def edit_notes(appointment_id):
 
     # Ensure status is Active
     now = datetime.now()
-    if appointment.appointment_date < now or "Cancellation Reason:" in appointment.notes:
+    if appointment.appointment_date < now or appointment.status == 'CANCELLED':
         
         flash("You can only edit notes for Active consultations.", category="error")
         return redirect(url_for('consultation.get_consultations'))
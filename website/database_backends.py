@@ -0,0 +1,197 @@
+import datetime
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema', 'sqlite.sql')
+
+class DatabaseBackend(ABC):
+    # Short dialect name, checked by code that cannot be written portably
+    name = None
+
+    @abstractmethod
+    def connect(self):
+        pass
+
+    @abstractmethod
+    def is_connection_error(self, exception):
+        pass
+
+    @abstractmethod
+    def is_integrity_error(self, exception):
+        pass
+
+
+class SqlServerBackend(DatabaseBackend):
+    name = 'mssql'
+
+    def __init__(self, server, database, username, password, driver="{ODBC Driver 18 for SQL Server}"):
+        self.connection_string = (
+            f"DRIVER={driver};"
+            f"SERVER={server};"
+            f"DATABASE={database};"
+            f"UID={username};"
+            f"PWD={password}"
+        )
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(self.connection_string)
+
+    def is_connection_error(self, exception):
+        # Only a broken link (SQLSTATE class 08) or a timeout (HYT00/HYT01)
+        # makes the pool drop the connection; constraint violations, syntax
+        # errors and deadlock victims leave it usable
+        import pyodbc
+        if isinstance(exception, pyodbc.InterfaceError):
+            return True
+        if not isinstance(exception, pyodbc.Error) or not exception.args:
+            return False
+        sqlstate = str(exception.args[0])
+        return sqlstate.startswith('08') or sqlstate in ('HYT00', 'HYT01')
+
+    def is_integrity_error(self, exception):
+        import pyodbc
+        return isinstance(exception, pyodbc.IntegrityError)
+
+
+def limit_rows(query, limit, dialect):
+    # Row limit for a SELECT: TOP on Azure SQL, LIMIT on SQLite
+    if dialect == 'mssql':
+        return query.replace('SELECT', f'SELECT TOP {int(limit)}', 1)
+    return f"{query} LIMIT {int(limit)}"
+
+
+def _convert_datetime(value):
+    return datetime.datetime.fromisoformat(value.decode())
+
+def _convert_date(value):
+    return datetime.date.fromisoformat(value.decode()[:10])
+
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("BIT", lambda value: bool(int(value)))
+
+
+class SqliteRow(tuple):
+    # Tuple with attribute access by column name, like pyodbc.Row
+    def __new__(cls, columns, values):
+        row = super().__new__(cls, values)
+        row._columns = columns
+        return row
+
+    def __getattr__(self, name):
+        try:
+            return self[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _row_factory(cursor, values):
+    columns = {}
+    for index, column in enumerate(cursor.description):
+        columns.setdefault(column[0], index)
+    return SqliteRow(columns, values)
+
+
+class SqliteCursor:
+    # Accepts pyodbc-style parameters: execute(sql, a, b) as well as
+    # execute(sql, (a, b)) and execute(sql, a)
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, params):
+        self._cursor.executemany(sql, params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchval(self):
+        row = self._cursor.fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SqliteConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return SqliteCursor(self._connection.cursor())
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class SqliteBackend(DatabaseBackend):
+    # Local stand-in for the Azure SQL database, used for offline load tests
+    # and benchmarks. The schema is created on first connect.
+    name = 'sqlite'
+
+    def __init__(self, path, bootstrap=True):
+        self.path = path
+        self.bootstrap = bootstrap
+        self._bootstrapped = False
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory and self.path != ':memory:':
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=30)
+        connection.row_factory = _row_factory
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        if self.bootstrap and not self._bootstrapped:
+            bootstrap_schema(connection)
+            self._bootstrapped = True
+        return SqliteConnection(connection)
+
+    def is_connection_error(self, exception):
+        return isinstance(exception, sqlite3.OperationalError)
+
+    def is_integrity_error(self, exception):
+        return isinstance(exception, sqlite3.IntegrityError)
+
+
+def bootstrap_schema(connection):
+    exists = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'User'").fetchone()
+    if exists:
+        return False
+    with open(SCHEMA_PATH) as schema:
+        connection.executescript(schema.read())
+    connection.commit()
+    return True
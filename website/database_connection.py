@@ -1,27 +1,230 @@
-import pyodbc
+import queue
+import threading
+import time
+
+from flask import g, has_app_context
 
 class DatabaseConnection:
-    _instance = None
-
-    def __new__(cls, server, database, username, password, driver="{ODBC Driver 18 for SQL Server}"):
-        if cls._instance is None:
-            cls._instance = super(DatabaseConnection, cls).__new__(cls)
-            cls._instance.connection = None
-            cls._instance.connection_string = (
-                f"DRIVER={driver};"
-                f"SERVER={server};"
-                f"DATABASE={database};"
-                f"UID={username};"
-                f"PWD={password}"
-            )
-        return cls._instance
+    # One per app: every create_app call gets its own backend and pool, so
+    # apps built with different configs in one process stay separate
+    def __init__(self, backend):
+        self.backend = backend
+        self.connection = None
+        self.pool = None
+
+    def connect(self):
+        return self.backend.connect()
 
     def get_connection(self):
         if self.connection is None:
             try:
-                self.connection = pyodbc.connect(self.connection_string)
+                self.connection = self.connect()
                 print("Database connection established")
             except Exception as e:
                 print("Database connection failed:", e)
                 self.connection = None
         return self.connection
+
+    def get_pool(self, max_size=10, timeout=30.0):
+        if self.pool is None:
+            self.pool = ConnectionPool(self.connect, max_size=max_size, timeout=timeout)
+        return self.pool
+
+    def get_pooled_connection(self, max_size=10, timeout=30.0):
+        return PooledConnection(self.get_pool(max_size, timeout), self.backend)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size=10, timeout=30.0, health_check_interval=30.0,
+                 max_retries=5, backoff=0.5, max_backoff=8.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # Idle connections as (connection, last_used) pairs
+        self._idle = queue.LifoQueue()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.opened = 0
+        self.connect_failures = 0
+        self.discarded = 0
+
+    def checkout(self):
+        start = time.monotonic()
+        connection = self._acquire()
+        waited = time.monotonic() - start
+
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        return connection
+
+    def checkin(self, connection, broken=False):
+        if not broken:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            self._discard(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "idle": self._idle.qsize(),
+                "in_use": self._size - self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_time": self.total_wait_time,
+                "max_wait_time": self.max_wait_time,
+                "avg_wait_time": self.total_wait_time / self.checkouts if self.checkouts else 0.0,
+                "opened": self.opened,
+                "connect_failures": self.connect_failures,
+                "discarded": self.discarded,
+            }
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+
+            if connection is not None:
+                if self._is_healthy(connection, last_used):
+                    return connection
+                self._discard(connection)
+                continue
+
+            with self._lock:
+                can_grow = self._size < self.max_size
+                if can_grow:
+                    self._size += 1
+            if can_grow:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self.timeouts += 1
+                raise PoolTimeout(f"No database connection available after {self.timeout}s")
+            try:
+                connection, last_used = self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+            if self._is_healthy(connection, last_used):
+                return connection
+            self._discard(connection)
+
+    def _is_healthy(self, connection, last_used):
+        # Connections that sat idle for a while are pinged before being handed out
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            connection.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.discarded += 1
+
+    def _open(self):
+        delay = self.backoff
+        for attempt in range(self.max_retries):
+            try:
+                connection = self._connect()
+                with self._lock:
+                    self.opened += 1
+                return connection
+            except Exception as e:
+                with self._lock:
+                    self.connect_failures += 1
+                if attempt == self.max_retries - 1:
+                    print("Database connection failed:", e)
+                    raise
+                print(f"Database connection failed, retrying in {delay:.1f}s:", e)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+
+class PooledConnection:
+    # Stand-in for a single connection on app.db. Each app context (one per
+    # request) checks out its own connection on first use and returns it on
+    # teardown, so blueprints keep calling current_app.db.cursor()/commit().
+    def __init__(self, pool, backend):
+        self.pool = pool
+        self.backend = backend
+        # Optional MetricsRegistry and SqlTracer that wrap the cursors handed
+        # out to requests
+        self.metrics = None
+        self.tracer = None
+
+    @property
+    def dialect(self):
+        return self.backend.name
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.release)
+
+    def _connection(self):
+        if not has_app_context():
+            raise RuntimeError("A pooled database connection needs an application context")
+        if "db_connection" not in g:
+            g.db_connection = self.pool.checkout()
+        return g.db_connection
+
+    def release(self, exception=None):
+        connection = g.pop("db_connection", None)
+        if connection is not None:
+            self.pool.checkin(connection, broken=exception is not None and self.backend.is_connection_error(exception))
+
+    def cursor(self):
+        cursor = self._connection().cursor()
+        if self.metrics is not None:
+            cursor = self.metrics.wrap_cursor(cursor)
+        if self.tracer is not None:
+            cursor = self.tracer.wrap_cursor(cursor)
+        return cursor
+
+    def commit(self):
+        self._connection().commit()
+        if self.tracer is not None:
+            self.tracer.record_commit()
+
+    def rollback(self):
+        self._connection().rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
@@ -0,0 +1,53 @@
+import csv
+import os
+import threading
+import time
+
+def normalize_disease_name(name):
+    # The CSV has entries like "Hypertension " and non-breaking spaces, and
+    # the model's output casing is not guaranteed
+    return " ".join(name.split()).lower()
+
+
+class DiseaseSpecializationMap:
+    # Disease name -> specialization name from Doctor_Versus_Disease.csv,
+    # parsed once and parsed again only when the file's size or modification
+    # time changes (checked at most every check_interval seconds)
+    def __init__(self, path, check_interval=30.0):
+        self.path = path
+        self.check_interval = check_interval
+
+        self._mapping = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, disease):
+        self._refresh()
+        return self._mapping.get(normalize_disease_name(disease))
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if self._signature is not None and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if signature != self._signature:
+                    self._mapping = self._load()
+                    self._signature = signature
+            except Exception as e:
+                # The previous mapping stays in use
+                print(f"Error reading CSV file: {e}")
+
+    def _load(self):
+        mapping = {}
+        with open(self.path, mode='r', encoding='latin-1') as file:
+            for row in csv.reader(file):
+                if len(row) == 2:
+                    mapping[normalize_disease_name(row[0])] = " ".join(row[1].split())
+        return mapping
@@ -1,9 +1,16 @@
-from flask import Blueprint, current_app, jsonify, render_template, request, flash, redirect, url_for
+from flask import Blueprint, current_app, jsonify, make_response, render_template, request, flash, redirect, url_for
 from flask_login import current_user, login_required
 import time, datetime
+from .notifications import get_unread_count
+from .reference_data import doctor_directory, get_doctor as get_directory_doctor, not_modified, not_modified_response, personal_etag, set_validators
+from .availability import create_availability_slots, consecutive_slots, timetable_slots, SlotOverlap
 
 doctor = Blueprint('doctor', __name__)
 
+MAX_TIMETABLE_WEEKS = 12
+EARLIEST_SLOTS_DEFAULT_DAYS = 14
+EARLIEST_SLOTS_MAX = 50
+
 def validate_interval(interval):
     if interval == '' or interval == None:
         return True, 'Unavailable'
@@ -35,22 +42,28 @@ def validate_slots(date, startSlot, consecutiveConsultations):
 @doctor.route('/doctors-list', methods=['GET'])
 @login_required
 def get_doctors():
-    conn = current_app.db
-    cursor = conn.cursor()
+    doctors, etag, last_modified = doctor_directory()
+    # The page also shows the user's name and unread count, so only the ETag
+    # (which covers them) is used to validate it
+    etag = personal_etag(etag, current_user.userid, current_user.username, get_unread_count(current_user.userid))
+    if not_modified(etag):
+        return not_modified_response(etag)
 
-    doctors = cursor.execute("SELECT [username], [specialization_name], [medicID] FROM [Medic] LEFT JOIN [Specialization] ON [Medic].[specializationID] = [Specialization].[specializationID] INNER JOIN [User] ON [User].[userID] = [Medic].[medicID]").fetchall()
- 
-    return render_template("doctors/doctors_list.html", doctors=doctors, user=current_user)
+    response = make_response(render_template("doctors/doctors_list.html", doctors=doctors, user=current_user))
+    return set_validators(response, etag)
 
 @doctor.route('/get-doctors', methods=['GET'])
 @login_required
 def get_doctors_json():
     specialization_id = request.args.get('specialization_id')
-    conn = current_app.db
-    cursor = conn.cursor()
-    doctors = cursor.execute("SELECT [username], [specialization_name], [medicID] FROM [Medic] LEFT JOIN [Specialization] ON [Medic].[specializationID] = [Specialization].[specializationID] INNER JOIN [User] ON [User].[userID] = [Medic].[medicID] WHERE [Medic].[specializationID] = ? AND [medicID] <> ?", specialization_id, current_user.userid).fetchall()
-    doctors_list = [{'medicID': doctor.medicID, 'username': doctor.username} for doctor in doctors]
-    return jsonify(doctors=doctors_list)
+    doctors, etag, last_modified = doctor_directory()
+    etag = personal_etag(etag, specialization_id, current_user.userid)
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    doctors_list = [{'medicID': doctor.medicID, 'username': doctor.username} for doctor in doctors
+                    if str(doctor.specializationID) == str(specialization_id) and doctor.medicID != current_user.userid]
+    return set_validators(jsonify(doctors=doctors_list), etag, last_modified)
 
 @doctor.route('/doctor-profile/<int:doctorid>', methods=['GET'])
 @login_required
@@ -105,8 +118,6 @@ def update_timetable():
 @doctor.route('/availability-form', methods=['GET', 'POST'])
 @login_required
 def availability_form():
-    conn = current_app.db
-    cursor = conn.cursor()
     if request.method == 'POST':
         date = request.form.get('availabilityDate')
         start_time = request.form.get('availabilityStartSlot')
@@ -114,35 +125,43 @@ def availability_form():
         if validate_slots(date, start_time, consultations)[0] == False:
             flash(validate_slots(date, start_time, consultations)[1], category='error')
             return render_template("doctors/availability_form.html", user=current_user)
-        ok = True
-        for i in range(0, int(consultations)):
-            start_slot = datetime.datetime.strptime(start_time, '%H:%M') + datetime.timedelta(minutes=i*30)
-            start_date = datetime.datetime.strptime(date + ' ' + start_slot.strftime('%H:%M'), '%Y-%m-%d %H:%M')
-            end_date = start_date + datetime.timedelta(minutes=30)
-            same_hour_pattern = start_date.strftime('%Y-%m-%d %H:') + '00'
-            previous_hour_pattern = (start_date - datetime.timedelta(hours=1)).strftime('%Y-%m-%d %H:') + '00'
-            next_hour_pattern = (start_date + datetime.timedelta(hours=1)).strftime('%Y-%m-%d %H:') + '00'
-            print(same_hour_pattern)
-            same_hour = cursor.execute('SELECT [start_time], [end_time] FROM [Availability] WHERE [medicID] = ? AND ([start_time] > ? AND [start_time] < ?)', current_user.userid, previous_hour_pattern, next_hour_pattern).fetchall()
-            if same_hour:
-                for slot in same_hour:
-                    if abs(slot.start_time - start_date) < datetime.timedelta(minutes=30):
-                        ok = False
-                        flash(f'Slot {start_date.time()} - {end_date.time()} overlaps with an existing slot ({slot.start_time.time()} - {slot.end_time.time()}).', category='error')
-                        return render_template("doctors/availability_form.html", user=current_user)
-        if ok:
-            for i in range(0, int(consultations)):
-                start_slot = datetime.datetime.strptime(start_time, '%H:%M') + datetime.timedelta(minutes=i*30)
-                start_date = datetime.datetime.strptime(date + ' ' + start_slot.strftime('%H:%M'), '%Y-%m-%d %H:%M')
-                end_date = start_date + datetime.timedelta(minutes=30)
-                cursor.execute('INSERT INTO [Availability] ([date], [start_time], [end_time], [medicID], [availability_status]) VALUES (?, ?, ?, ?, ?)', datetime.datetime.strptime(date, '%Y-%m-%d'), start_date, end_date, current_user.userid, 'FREE')
-                conn.commit()
-            availability_slots = cursor.execute('SELECT [date], [start_time], [end_time], [availability_status] FROM [Availability] WHERE [medicID] = ? ORDER BY [date], [start_time] DESC', current_user.userid).fetchall()
-            flash("Availability slots added successfully.", category='success')
-            return render_template("doctors/availability_slots.html", user=current_user, availability_slots=availability_slots)
+        first_start = datetime.datetime.strptime(date + ' ' + start_time, '%Y-%m-%d %H:%M')
+        try:
+            created_slots = create_availability_slots(current_user.userid, consecutive_slots(first_start, int(consultations)))
+        except SlotOverlap as e:
+            flash(str(e), category='error')
+            return render_template("doctors/availability_form.html", user=current_user)
+        flash("Availability slots added successfully.", category='success')
+        return render_template("doctors/availability_slots.html", user=current_user, availability_slots=created_slots)
 
     return render_template("doctors/availability_form.html", user=current_user)
 
+@doctor.route('/availability-from-timetable', methods=['POST'])
+@login_required
+def availability_from_timetable():
+    conn = current_app.db
+    cursor = conn.cursor()
+    timetable = cursor.execute('SELECT [mon], [tue], [wed], [thu], [fri], [sat], [sun] FROM [TimeTable] WHERE [medicID] = ?', current_user.userid).fetchone()
+    if not timetable:
+        flash("Please set your timetable first.", category='error')
+        return render_template("doctors/availability_form.html", user=current_user)
+
+    try:
+        first_day = datetime.datetime.strptime(request.form.get('firstDay', ''), '%Y-%m-%d').date()
+        weeks = int(request.form.get('weeks', ''))
+    except ValueError:
+        flash("Please choose a start date and a number of weeks.", category='error')
+        return render_template("doctors/availability_form.html", user=current_user)
+    if weeks < 1 or weeks > MAX_TIMETABLE_WEEKS:
+        flash(f"The number of weeks must be between 1 and {MAX_TIMETABLE_WEEKS}.", category='error')
+        return render_template("doctors/availability_form.html", user=current_user)
+
+    # Slots that overlap existing ones are skipped, so the same weeks can be
+    # filled again after the timetable changes
+    created_slots = create_availability_slots(current_user.userid, timetable_slots(timetable, first_day, weeks), skip_overlaps=True)
+    flash(f"{len(created_slots)} availability slots added from your timetable.", category='success')
+    return render_template("doctors/availability_slots.html", user=current_user, availability_slots=created_slots)
+
 @doctor.route('/availability-list', methods=['GET'])
 @login_required
 def get_availability_list():
@@ -159,13 +178,38 @@ def get_availability_list():
 @doctor.route('/get-slots', methods=['GET'])
 @login_required
 def get_slots():
-    conn = current_app.db
-    cursor = conn.cursor()
-    doctorid = request.args.get('doctor_id')
-    date = request.args.get('appointment_date')
-    print(doctorid, date)
-    slots = cursor.execute('SELECT [availabilityID], [start_time], [end_time] FROM [Availability] WHERE [medicID] = ? AND [date] = ? AND [availability_status] = \'FREE\'', doctorid, date).fetchall()
-    return jsonify(slots=[{'start_time': slot.start_time, 'end_time': slot.end_time, 'availability_id': slot.availabilityID} for slot in slots])
+    try:
+        doctorid = int(request.args.get('doctor_id'))
+        day = datetime.datetime.strptime(request.args.get('appointment_date'), '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify(slots=[])
+    slots = current_app.slot_index.free_slots(doctorid, day, day + datetime.timedelta(days=1))
+    return jsonify(slots=[{'start_time': slot['start_time'], 'end_time': slot['end_time'], 'availability_id': slot['availability_id']} for slot in slots])
+
+@doctor.route('/earliest-slots', methods=['GET'])
+@login_required
+def get_earliest_slots():
+    # The N earliest free slots across every doctor of a specialization, in
+    # one round trip instead of /get-doctors followed by /get-slots per doctor
+    try:
+        specialization_id = int(request.args.get('specialization_id'))
+        first_day = datetime.datetime.strptime(request.args.get('from') or datetime.date.today().isoformat(), '%Y-%m-%d')
+        last_day = datetime.datetime.strptime(request.args['to'], '%Y-%m-%d') if request.args.get('to') else first_day + datetime.timedelta(days=EARLIEST_SLOTS_DEFAULT_DAYS - 1)
+        limit = min(max(int(request.args.get('limit', 10)), 1), EARLIEST_SLOTS_MAX)
+    except (TypeError, ValueError):
+        return jsonify(error="specialization_id is required; from and to must be YYYY-MM-DD dates"), 400
+
+    # A doctor looking for a colleague never gets their own slots back
+    slots = current_app.slot_index.earliest_free_slots(specialization_id, first_day, last_day + datetime.timedelta(days=1), limit,
+                                                       exclude_medic_id=current_user.userid)
+
+    # Names come from the cached doctor directory behind /get-doctors
+    result = []
+    for slot in slots:
+        doctor = get_directory_doctor(slot['medic_id'])
+        result.append({'availability_id': slot['availability_id'], 'medic_id': slot['medic_id'], 'username': doctor.username if doctor else None,
+                       'start_time': slot['start_time'], 'end_time': slot['end_time']})
+    return jsonify(slots=result)
 
 @doctor.route('/consultation-summary/<int:pacient_id>', methods=['GET'])
 @login_required
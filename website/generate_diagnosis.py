@@ -1,46 +1,66 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from flask import Blueprint, make_response, render_template, request, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from modules.ai_diagnosis_prediction.ai_context import AIContext
+from werkzeug.exceptions import RequestEntityTooLarge
+from concurrent.futures import TimeoutError
+from modules.ai_diagnosis_prediction.batching import BatchingPredictor
+from modules.ai_diagnosis_prediction.model_registry import ModelRegistry
+from modules.ai_diagnosis_prediction.prediction_cache import PredictionCache
 from modules.ai_diagnosis_prediction.strategies.diagnosis_classifier_strategy import DiagnosisClassifierStrategy
-import PyPDF2
+from modules.ai_diagnosis_prediction.strategies.quantized_diagnosis_classifier_strategy import QuantizedDiagnosisClassifierStrategy
+from .disease_specializations import DiseaseSpecializationMap
+from .reference_cache import DOCTOR_DIRECTORY_TABLES
+from .pdf_symptoms import PdfExtractor, PdfRejected
+from .metrics import registry as metrics_registry
 import spacy
-import re
-import csv
+import time
+import os
 
 diagnosis = Blueprint('diagnosis', __name__)
 
-model_strategy = DiagnosisClassifierStrategy()
-ai_context = AIContext(model_strategy)
+MODEL_PATH = "modules/ai_diagnosis_prediction/trained_model"
+
+# DIAGNOSIS_STRATEGY=quantized serves the int8 model on CPU-only nodes
+STRATEGIES = {
+    "default": DiagnosisClassifierStrategy,
+    "quantized": QuantizedDiagnosisClassifierStrategy,
+}
+strategy_factory = STRATEGIES.get(os.environ.get("DIAGNOSIS_STRATEGY", "default"), DiagnosisClassifierStrategy)
+
+# Predictions are cached by normalized symptom list; the on-disk part of the
+# cache is kept across restarts and cleared when the checkpoint changes
+prediction_cache = PredictionCache(os.environ.get("DIAGNOSIS_CACHE_PATH", "instance/diagnosis_cache.sqlite3"))
+
+# The checkpoint is loaded on first use and stays resident; it is reloaded
+# only when the files in MODEL_PATH change
+model_registry = ModelRegistry(strategy_factory, MODEL_PATH, cache=prediction_cache,
+                               stage_observer=metrics_registry.observe_inference_stage)
+
+# Concurrent /diagnosis requests are answered by one batched generate call
+predictor = BatchingPredictor(model_registry.get_context)
 
 nlp = spacy.load("en_core_web_sm")
 
-def generate_diagnosis_from_symptoms(symptoms):
-    ai_context.load_model("modules/ai_diagnosis_prediction/trained_model")
-    predicted_disease = ai_context.generate_disease_name(symptoms)
-    return predicted_disease
+# Uploaded PDFs are parsed in worker processes, within size, page and time limits
+pdf_extractor = PdfExtractor(max_workers=int(os.environ.get("PDF_WORKERS", "2")))
+
+# Parsed once, and again only when the file changes
+disease_specializations = DiseaseSpecializationMap('Doctor_Versus_Disease.csv')
 
-def extract_symptoms_from_pdf(file):
+def generate_diagnosis_from_symptoms(symptoms):
+    # Raises TimeoutError when the model does not answer within
+    # DIAGNOSIS_PREDICT_TIMEOUT seconds
+    start = time.perf_counter()
     try:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = "".join(page.extract_text() for page in pdf_reader.pages)
-        
-        symptoms_section = re.search(r"SYMPTOMS\s*([\s\S]+?)(?=\n\s*[A-Za-z]|\n\s*$)", text, re.IGNORECASE)
-        
-        if symptoms_section:
-            symptoms = symptoms_section.group(1).strip().split("\n")
-            symptoms = [symptom.strip('- ').strip() for symptom in symptoms if symptom.strip()]
-            return symptoms
-        else:
-            return []
-    except Exception as e:
-        print(f"Error processing PDF: {e}")
-        return []
+        return predictor.predict(symptoms, timeout=current_app.config['DIAGNOSIS_PREDICT_TIMEOUT'])
+    finally:
+        metrics_registry.observe_diagnosis_stage("predict", time.perf_counter() - start)
 
 @diagnosis.route('/diagnosis', methods=['GET', 'POST'])
 @login_required
 def generate_diagnosis():
     diagnosis_result = None
     extracted_symptoms = None
+    timings = None
 
     manual_symptoms = request.form.get('symptoms')
     pdf_file = request.files.get('pdf')
@@ -48,72 +68,87 @@ def generate_diagnosis():
     if manual_symptoms and pdf_file:
         flash("Please provide symptoms either manually or via PDF, not both.", category="error")
     elif manual_symptoms:
-        diagnosis_result = generate_diagnosis_from_symptoms(manual_symptoms)
-
-        if not diagnosis_result: 
-            flash("No diagnosis found. Please check the symptoms input.", category="error")
+        try:
+            diagnosis_result = generate_diagnosis_from_symptoms(manual_symptoms)
+        except TimeoutError:
+            print("Diagnosis prediction timed out")
+            flash("The symptoms could not be processed.", category="error")
         else:
-            flash("Diagnosis generated successfully.", category="success")
-    elif pdf_file:
-        extracted_symptoms = extract_symptoms_from_pdf(pdf_file)
-        if extracted_symptoms:
-            combined_symptoms = ", ".join(extracted_symptoms)
-            diagnosis_result = generate_diagnosis_from_symptoms(combined_symptoms)
-            if diagnosis_result:
-                flash("Diagnosis generated successfully.", category="success")
+            if not diagnosis_result:
+                flash("No diagnosis found. Please check the symptoms input.", category="error")
             else:
-                flash("No diagnosis found. Please refine the symptoms extracted from the PDF.", category="error")
+                flash("Diagnosis generated successfully.", category="success")
+    elif pdf_file:
+        try:
+            extracted_symptoms, timings = pdf_extractor.extract(pdf_file)
+        except PdfRejected as e:
+            flash(str(e), category="error")
         else:
-            flash("No symptoms could be extracted from the uploaded PDF.", category="error")
-
-    return render_template('diagnosis.html', diagnosis=diagnosis_result, symptoms=extracted_symptoms)
+            metrics_registry.observe_diagnosis_stage("pdf_parse", timings["parse"] / 1000)
+            metrics_registry.observe_diagnosis_stage("pdf_extract", timings["extract"] / 1000)
+            if extracted_symptoms:
+                combined_symptoms = ", ".join(extracted_symptoms)
+                start = time.perf_counter()
+                try:
+                    diagnosis_result = generate_diagnosis_from_symptoms(combined_symptoms)
+                except TimeoutError:
+                    print("Diagnosis prediction timed out")
+                    flash("The symptoms could not be processed.", category="error")
+                else:
+                    if diagnosis_result:
+                        flash("Diagnosis generated successfully.", category="success")
+                    else:
+                        flash("No diagnosis found. Please refine the symptoms extracted from the PDF.", category="error")
+                timings["predict"] = (time.perf_counter() - start) * 1000
+            else:
+                flash("No symptoms could be extracted from the uploaded PDF.", category="error")
+
+    response = make_response(render_template('diagnosis.html', diagnosis=diagnosis_result, symptoms=extracted_symptoms))
+    if timings:
+        print("PDF diagnosis timings: " + ", ".join(f"{stage} {duration:.1f} ms" for stage, duration in timings.items()))
+        response.headers["Server-Timing"] = ", ".join(f"{stage};dur={duration:.1f}" for stage, duration in timings.items())
+    return response
+
+def load_doctors_for_specialization(specialization):
+    cursor = current_app.db.cursor()
+    cursor.execute("""
+        SELECT medicID, s.specializationID, u.username AS doctor_name, s.specialization_name AS specialization_name
+        FROM Medic m
+        INNER JOIN Specialization s ON m.specializationID = s.specializationID
+        INNER JOIN [User] u ON m.medicID = u.userID
+        WHERE s.specialization_name = ? 
+    """, (specialization,))
+    return [
+        {"medicID":doctor[0], "specializationID": doctor[1], "name": doctor[2], "specialization": doctor[3]} for doctor in cursor.fetchall()
+    ]
 
 def get_suggested_doctors(diagnosis):
-    diagnosis_to_specialization = {}
-
-    try:
-        with open('Doctor_Versus_Disease.csv', mode='r') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                if len(row) == 2:
-                    diagnosis_to_specialization[row[0].strip()] = row[1].strip()
-    except Exception as e:
-        print(f"Error reading CSV file: {e}")
-        return []
-
-    specialization = diagnosis_to_specialization.get(diagnosis)
+    specialization = disease_specializations.get(diagnosis)
     if not specialization:
         print(f"No specialization found for diagnosis: {diagnosis}")
         return []
 
     try:
-        conn = current_app.db 
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT medicID, s.specializationID, u.username AS doctor_name, s.specialization_name AS specialization_name
-            FROM Medic m
-            INNER JOIN Specialization s ON m.specializationID = s.specializationID
-            INNER JOIN [User] u ON m.medicID = u.userID
-            WHERE s.specialization_name = ? 
-        """, (specialization,))
-        
-        doctors = cursor.fetchall()
-        
-        if not doctors:
+        doctor_list = current_app.reference_cache.get(
+            ('doctors_by_specialization', specialization),
+            DOCTOR_DIRECTORY_TABLES,
+            lambda: load_doctors_for_specialization(specialization))
+
+        if not doctor_list:
             print(f"No doctors found for specialization: {specialization}")
             return []
 
-        doctor_list = [
-            {"medicID":doctor[0], "specializationID": doctor[1], "name": doctor[2], "specialization": doctor[3]} for doctor in doctors
-        ]
-        
         return doctor_list
 
     except Exception as e:
         print(f"Error querying the database: {e}")
         return []
 
+@diagnosis.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    flash("The uploaded file is too large.", category="error")
+    return redirect(url_for('diagnosis.generate_diagnosis'))
+
 @diagnosis.route('/suggest-doctors', methods=['POST'])
 @login_required
 def suggest_doctors():
@@ -0,0 +1,237 @@
+import bisect
+import hmac
+import threading
+import time
+from flask import Blueprint, current_app, g, request
+
+metrics = Blueprint('metrics', __name__)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+INFERENCE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STATEMENT_KINDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_samples(name, kind, help_text, samples, label_names=()):
+    # samples is a list of (label_values, value) in the Prometheus text format
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_values, value in samples:
+        lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+    return lines
+
+
+class Histogram:
+    # Bucket counts per label combination. observe() is a bisect and a few
+    # additions under a lock; the cumulative buckets Prometheus expects are
+    # only built when /metrics is scraped.
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {labels: (list(series[0]), series[1]) for labels, series in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.label_names + ("le",)
+        for label_values, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels, label_values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+
+class TimedCursor:
+    def __init__(self, cursor, histogram):
+        self._cursor = cursor
+        self._histogram = histogram
+
+    def execute(self, sql, *params):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            self._histogram.observe(time.perf_counter() - start, statement_kind(sql))
+        return self
+
+    def executemany(self, sql, params):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, params)
+        finally:
+            self._histogram.observe(time.perf_counter() - start, statement_kind(sql))
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Options such as fast_executemany belong to the wrapped cursor
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+def statement_kind(sql):
+    words = sql.split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in STATEMENT_KINDS else "OTHER"
+
+
+class MetricsRegistry:
+    # Latency histograms for requests, SQL statements, model inference and
+    # the /diagnosis stages, plus pool, queue and cache figures read from the
+    # objects that already keep them when /metrics is scraped. Values are per
+    # process; with several workers each one is scraped separately.
+    def __init__(self):
+        self.requests = Histogram(
+            "telemedix_http_request_duration_seconds", "Time spent handling a request.",
+            ("method", "route", "status"), REQUEST_BUCKETS)
+        self.statements = Histogram(
+            "telemedix_db_statement_duration_seconds", "Time spent executing a SQL statement.",
+            ("kind",), STATEMENT_BUCKETS)
+        self.inference = Histogram(
+            "telemedix_inference_stage_duration_seconds",
+            "Time spent per model stage: checkpoint load, and tokenize, generate and decode per batch.",
+            ("stage",), INFERENCE_BUCKETS)
+        self.diagnosis = Histogram(
+            "telemedix_diagnosis_stage_duration_seconds",
+            "Time spent per /diagnosis stage: PDF parse and extract, and prediction including the batching queue.",
+            ("stage",), INFERENCE_BUCKETS)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.db.metrics = self
+        app.metrics = self
+
+    def wrap_cursor(self, cursor):
+        return TimedCursor(cursor, self.statements)
+
+    def observe_inference_stage(self, stage, seconds):
+        self.inference.observe(seconds, stage)
+
+    def observe_diagnosis_stage(self, stage, seconds):
+        self.diagnosis.observe(seconds, stage)
+
+    def render(self, app):
+        lines = []
+        for histogram in (self.requests, self.statements, self.inference, self.diagnosis):
+            lines.extend(histogram.render())
+        lines.extend(self._pool_lines(app.db.pool.stats()))
+        lines.extend(self._cache_lines(self._caches(app)))
+        lines.extend(self._diagnosis_lines())
+
+        slots = app.slot_index.stats()
+        lines.extend(render_samples("telemedix_slot_index_slots", "gauge", "Free slots held in the slot index.", [((), slots["slots"])]))
+        lines.extend(render_samples("telemedix_slot_index_age_seconds", "gauge", "Seconds since the slot index was loaded.", [((), slots["age"])]))
+        return "\n".join(lines) + "\n"
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+
+    def _finish(self, response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            # The URL rule, not the path, keeps the number of series bounded
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            self.requests.observe(time.perf_counter() - start, request.method, route, response.status_code)
+        return response
+
+    def _pool_lines(self, stats):
+        lines = []
+        for name, key, kind, help_text in (
+                ("telemedix_db_pool_size", "size", "gauge", "Open database connections."),
+                ("telemedix_db_pool_max_size", "max_size", "gauge", "Maximum database connections."),
+                ("telemedix_db_pool_in_use", "in_use", "gauge", "Database connections checked out."),
+                ("telemedix_db_pool_idle", "idle", "gauge", "Idle database connections."),
+                ("telemedix_db_pool_checkouts_total", "checkouts", "counter", "Database connections handed out."),
+                ("telemedix_db_pool_timeouts_total", "timeouts", "counter", "Checkouts that timed out waiting for a connection."),
+                ("telemedix_db_pool_wait_seconds_total", "total_wait_time", "counter", "Seconds spent waiting for a database connection."),
+                ("telemedix_db_pool_max_wait_seconds", "max_wait_time", "gauge", "Longest wait for a database connection."),
+                ("telemedix_db_pool_opened_total", "opened", "counter", "Database connections opened."),
+                ("telemedix_db_pool_connect_failures_total", "connect_failures", "counter", "Failed attempts to open a database connection."),
+                ("telemedix_db_pool_discarded_total", "discarded", "counter", "Database connections closed as broken or stale.")):
+            lines.extend(render_samples(name, kind, help_text, [((), stats[key])]))
+        return lines
+
+    def _caches(self, app):
+        from .generate_diagnosis import prediction_cache
+        return {
+            "user": app.user_cache,
+            "reference": app.reference_cache,
+            "prediction": prediction_cache,
+        }
+
+    def _cache_lines(self, caches):
+        hits = [((name,), cache.hits) for name, cache in caches.items()]
+        misses = [((name,), cache.misses) for name, cache in caches.items()]
+        ratios = [((name,), cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else None)
+                  for name, cache in caches.items()]
+        lines = []
+        lines.extend(render_samples("telemedix_cache_hits_total", "counter", "Cache lookups answered from the cache.", hits, ("cache",)))
+        lines.extend(render_samples("telemedix_cache_misses_total", "counter", "Cache lookups that had to load the value.", misses, ("cache",)))
+        lines.extend(render_samples("telemedix_cache_hit_ratio", "gauge", "Share of cache lookups that were hits.", ratios, ("cache",)))
+        return lines
+
+    def _diagnosis_lines(self):
+        from .generate_diagnosis import predictor, model_registry
+        lines = []
+        lines.extend(render_samples("telemedix_inference_queue_depth", "gauge", "Symptom descriptions waiting for the next model batch.", [((), predictor.queue_depth())]))
+        lines.extend(render_samples("telemedix_inference_model_loaded", "gauge", "Whether the diagnosis model is resident.", [((), int(model_registry.ai_context is not None))]))
+        return lines
+
+
+registry = MetricsRegistry()
+
+
+@metrics.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # The figures describe every user's traffic, so scrapes must present
+    # METRICS_TOKEN as a bearer token
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        if not current_app.debug:
+            return current_app.response_class("Not Found\n", status=404, mimetype='text/plain')
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return current_app.response_class("Unauthorized\n", status=401, mimetype='text/plain',
+                                          headers={'WWW-Authenticate': 'Bearer'})
+    return current_app.response_class(registry.render(current_app), mimetype='text/plain; version=0.0.4')
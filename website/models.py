@@ -41,7 +41,7 @@ class Medic():
         return self.medicid
     
 class Appointment():
-    def __init__(self, appointmentid, patientid, medicid, appointment_date, availabilityid, serviceid, notes):
+    def __init__(self, appointmentid, patientid, medicid, appointment_date, availabilityid, serviceid, notes, status='BOOKED', cancellation_reason=None):
         self.appointmentid = appointmentid
         self.patientid = patientid
         self.medicid = medicid
@@ -49,6 +49,8 @@ class Appointment():
         self.availabilityid = availabilityid
         self.serviceid = serviceid
         self.notes = notes
+        self.status = status
+        self.cancellation_reason = cancellation_reason
 
     def get_id(self):
         return self.appointmentid
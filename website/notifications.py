@@ -1,65 +1,139 @@
 from datetime import datetime, timedelta
-from flask import current_app, flash, redirect, render_template, Blueprint, url_for
+from flask import current_app, flash, jsonify, redirect, render_template, request, Blueprint, url_for
 from flask_login import current_user, login_required
+from .database_backends import limit_rows
 
 notifications = Blueprint('notifications', __name__)
 
+# Unread notifications per user are kept in [NotificationCounter] and adjusted
+# in the same transaction as every write to [Notification], so the badge is a
+# primary key lookup instead of a COUNT(*). reconcile_unread_counts corrects
+# any drift periodically.
+
+UPDATE_UNREAD_SQL = "UPDATE NotificationCounter SET unread_count = unread_count + ? WHERE user_id = ?"
+
+def create_unread_counter(cursor, user_id):
+    # Run at sign-up, in the transaction that creates the user
+    cursor.execute("INSERT INTO NotificationCounter (user_id, unread_count) VALUES (?, 0)", (user_id,))
+
+def adjust_unread_count(cursor, user_id, delta):
+    cursor.execute(UPDATE_UNREAD_SQL, (delta, user_id))
+    if cursor.rowcount != 0:
+        return
+
+    # Users created before the counter existed get their row on the first
+    # write. Callers adjust after changing [Notification] in the same
+    # transaction, so the recount already includes that change and delta is
+    # not added on top. The count is a scalar subquery so that the NOT EXISTS
+    # guard can return no row at all.
+    try:
+        cursor.execute(
+            """
+            INSERT INTO NotificationCounter (user_id, unread_count)
+            SELECT ?, (SELECT COUNT(*) FROM Notification WHERE user_id = ? AND [read] = 0 AND deleted = 0)
+            WHERE NOT EXISTS (SELECT 1 FROM NotificationCounter WHERE user_id = ?)
+            """,
+            (user_id, user_id, user_id))
+        inserted = cursor.rowcount
+    except Exception as e:
+        if not current_app.db.backend.is_integrity_error(e):
+            raise
+        inserted = 0
+    if inserted == 0:
+        # A concurrent transaction created the row first; its count did not
+        # include this uncommitted change, so apply the delta to it
+        cursor.execute(UPDATE_UNREAD_SQL, (delta, user_id))
+
+def get_unread_count(user_id):
+    # Read-only, since it runs while pages render: a user without a counter
+    # row yet is counted directly and the row is left to the next write
+    cursor = current_app.db.cursor()
+
+    counter = cursor.execute(
+        "SELECT unread_count FROM NotificationCounter WHERE user_id = ?",
+        (user_id,)).fetchone()
+    if counter:
+        return counter[0]
+
+    return cursor.execute(
+        "SELECT COUNT(*) FROM Notification WHERE user_id = ? AND [read] = 0 AND deleted = 0",
+        (user_id,)).fetchone()[0]
+
+RECOUNT_UNREAD_SQL = """
+    UPDATE NotificationCounter
+    SET unread_count = (
+        SELECT COUNT(*) FROM Notification n
+        WHERE n.user_id = NotificationCounter.user_id AND n.[read] = 0 AND n.deleted = 0)
+    """
+
+def reconcile_unread_counts():
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    cursor.execute(RECOUNT_UNREAD_SQL)
+    updated = cursor.rowcount
+    conn.commit()
+    return updated
+
+# Reminder texts built in SQL, per database dialect
+REMINDER_MESSAGES = {
+    'mssql': (
+        "CONCAT('Reminder: Your consultation with doctor ', medic.username, ' is scheduled at ', CONVERT(varchar(16), a.appointment_date, 120), '.')",
+        "CONCAT('Reminder: You have a consultation with patient ', pacient.username, ' at ', CONVERT(varchar(16), a.appointment_date, 120), '.')",
+    ),
+    'sqlite': (
+        "'Reminder: Your consultation with doctor ' || medic.username || ' is scheduled at ' || strftime('%Y-%m-%d %H:%M', a.appointment_date) || '.'",
+        "'Reminder: You have a consultation with patient ' || pacient.username || ' at ' || strftime('%Y-%m-%d %H:%M', a.appointment_date) || '.'",
+    ),
+}
+
 def generate_one_hour_notifications():
+    # Run by the scheduler, never from a request. A single INSERT ... SELECT
+    # finds the consultations of the next hour, joins the other participant's
+    # name and skips reminders that already exist; the unread counters of the
+    # participants are then recounted in one statement, all in one transaction.
     conn = current_app.db
     cursor = conn.cursor()
 
     now = datetime.now()
     one_hour_later = now + timedelta(hours=1)
-    
-    consultations = cursor.execute(
-        """
-        SELECT appointmentID, medicID, pacientID, appointment_date 
-        FROM Appointment 
-        WHERE appointment_date BETWEEN ? AND ? 
-        AND (notes NOT LIKE '%Cancellation Reason:%' OR notes IS NULL)
+    pacient_message, medic_message = REMINDER_MESSAGES[conn.dialect]
+
+    cursor.execute(
+        f"""
+        INSERT INTO Notification (user_id, consultation_id, message, type)
+        SELECT reminder.user_id, reminder.appointmentID, reminder.message, 'one_hour'
+        FROM (
+            SELECT a.pacientID AS user_id, a.appointmentID, {pacient_message} AS message
+            FROM Appointment a
+            JOIN [User] medic ON medic.userID = a.medicID
+            WHERE a.appointment_date BETWEEN ? AND ?
+            AND a.status = 'BOOKED'
+            UNION ALL
+            SELECT a.medicID AS user_id, a.appointmentID, {medic_message} AS message
+            FROM Appointment a
+            JOIN [User] pacient ON pacient.userID = a.pacientID
+            WHERE a.appointment_date BETWEEN ? AND ?
+            AND a.status = 'BOOKED'
+        ) reminder
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Notification n
+            WHERE n.consultation_id = reminder.appointmentID AND n.user_id = reminder.user_id AND n.type = 'one_hour')
         """,
-        (now, one_hour_later)).fetchall()
-    
-    for consultation in consultations:
-        consultation_pacientID = consultation[2]
-        consultation_medicID = consultation[1]
-        for user_id in [consultation_pacientID, consultation_medicID]:
-            existing_notification = cursor.execute(
-                """
-                SELECT id 
-                FROM Notification 
-                WHERE consultation_id = ? AND user_id = ? AND type = 'one_hour'
-                """,
-                (consultation.appointmentID, user_id)).fetchone()
-
-            if not existing_notification:
-                formatted_datetime = consultation.appointment_date.strftime('%Y-%m-%d %H:%M')
-                if user_id == consultation_pacientID:
-                    doctor_details = cursor.execute(
-                        """
-                        SELECT username 
-                        FROM [User] 
-                        WHERE userID = ?
-                        """,
-                        (consultation_medicID,)).fetchone()
-                    message = f"Reminder: Your consultation with doctor {doctor_details.username} is scheduled at {formatted_datetime}."
-                else:
-                    patient_details = cursor.execute(
-                        """
-                        SELECT username 
-                        FROM [User] 
-                        WHERE userID = ?
-                        """,
-                        (consultation_pacientID,)).fetchone()
-                    message = f"Reminder: You have a consultation with patient {patient_details.username} at {formatted_datetime}."
-
-                cursor.execute(
-                    """
-                    INSERT INTO Notification (user_id, consultation_id, message, type) 
-                    VALUES (?, ?, ?, 'one_hour')
-                    """,
-                    (user_id, consultation.appointmentID, message))
-                conn.commit()
+        (now, one_hour_later, now, one_hour_later))
+    inserted = cursor.rowcount
+
+    if inserted > 0:
+        cursor.execute(
+            RECOUNT_UNREAD_SQL + """
+            WHERE user_id IN (
+                SELECT pacientID FROM Appointment WHERE appointment_date BETWEEN ? AND ?
+                UNION
+                SELECT medicID FROM Appointment WHERE appointment_date BETWEEN ? AND ?)
+            """,
+            (now, one_hour_later, now, one_hour_later))
+    conn.commit()
+    return max(inserted, 0)
 
 
 def create_consultation_notification(medic_id, consultation_id, patient_name, appointment_datetime):
@@ -67,6 +141,11 @@ def create_consultation_notification(medic_id, consultation_id, patient_name, ap
     conn = current_app.db
     cursor = conn.cursor()
 
+    insert_consultation_notification(cursor, medic_id, consultation_id, patient_name, appointment_datetime)
+    conn.commit()
+
+def insert_consultation_notification(cursor, medic_id, consultation_id, patient_name, appointment_datetime):
+    # Leaves the commit to the caller, so the booking transaction can include it
     formatted_datetime = appointment_datetime.strftime('%Y-%m-%d %H:%M')
     message = f"New consultation scheduled by {patient_name} for {formatted_datetime}."
 
@@ -76,13 +155,18 @@ def create_consultation_notification(medic_id, consultation_id, patient_name, ap
         VALUES (?, ?, ?, 'created')
         """,
         (medic_id, consultation_id, message))
-    conn.commit()
+    adjust_unread_count(cursor, medic_id, 1)
 
 def create_cancellation_notification(recipient_id, consultation_id, canceler_name, consultation_date, cancellation_reason=None):
 
     conn = current_app.db
     cursor = conn.cursor()
 
+    insert_cancellation_notification(cursor, recipient_id, consultation_id, canceler_name, consultation_date, cancellation_reason)
+    conn.commit()
+
+def insert_cancellation_notification(cursor, recipient_id, consultation_id, canceler_name, consultation_date, cancellation_reason=None):
+    # Leaves the commit to the caller, so the cancellation transaction can include it
     formatted_datetime = consultation_date.strftime('%Y-%m-%d %H:%M')
     message = f"{canceler_name} cancelled the consultation at {formatted_datetime}. "
     if cancellation_reason:
@@ -95,35 +179,119 @@ def create_cancellation_notification(recipient_id, consultation_id, canceler_nam
         """,
         (recipient_id, consultation_id, message)
     )
-    conn.commit()
+    adjust_unread_count(cursor, recipient_id, 1)
+
+NOTIFICATIONS_PAGE_SIZE = 20
+MAX_FEED_NOTIFICATIONS = 50
+# created_at is taken before the insert commits, so a notification can become
+# visible after a newer one has already moved the feed cursor past it. Every
+# poll re-reads this window behind the cursor; the page drops duplicates by id.
+FEED_OVERLAP = timedelta(seconds=10)
+
+NOTIFICATION_COLUMNS = "SELECT id, message, [read], created_at FROM Notification WHERE user_id = ? AND deleted = 0"
+
+def encode_notifications_cursor(notification):
+    return f"{notification.created_at.isoformat()}_{notification.id}"
+
+def decode_notifications_cursor(cursor_value):
+    try:
+        created_at, notification_id = cursor_value.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (AttributeError, ValueError):
+        return None
+
+def retrieve_notifications(user_id, before=None, page_size=NOTIFICATIONS_PAGE_SIZE):
+    # One page of the feed, newest first, in keyset order on (created_at, id)
+    # so older pages cost the same as the first one
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    query = NOTIFICATION_COLUMNS
+    params = [user_id]
+    if before:
+        query += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+        params.extend([before[0], before[0], before[1]])
+    query += " ORDER BY created_at DESC, id DESC"
+
+    # One extra row tells whether there is an older page
+    rows = cursor.execute(limit_rows(query, page_size + 1, conn.dialect), params).fetchall()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_notifications_cursor(rows[-1])
+    return rows, next_cursor
+
+def retrieve_notifications_since(user_id, since=None, limit=MAX_FEED_NOTIFICATIONS):
+    # Notifications newer than the since cursor, oldest first, the newest of
+    # them (the next cursor) and whether more are waiting beyond limit.
+    # Without a cursor, the latest ones. The rows of the FEED_OVERLAP window
+    # behind the cursor come first and do not count towards limit.
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    if since is None:
+        query = NOTIFICATION_COLUMNS + " ORDER BY created_at DESC, id DESC"
+        rows = cursor.execute(limit_rows(query, limit, conn.dialect), (user_id,)).fetchall()
+        return rows[::-1], rows[0] if rows else None, False
+
+    query = NOTIFICATION_COLUMNS + " AND (created_at > ? OR (created_at = ? AND id > ?)) ORDER BY created_at, id"
+    rows = cursor.execute(limit_rows(query, limit + 1, conn.dialect), (user_id, since[0], since[0], since[1])).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    overlap = cursor.execute(
+        NOTIFICATION_COLUMNS + " AND created_at >= ? AND (created_at < ? OR (created_at = ? AND id <= ?)) ORDER BY created_at, id",
+        (user_id, since[0] - FEED_OVERLAP, since[0], since[0], since[1])).fetchall()
+    return overlap + rows, rows[-1] if rows else None, has_more
+
+def notification_to_dict(notification):
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "read": bool(notification.read),
+        "created_at": notification.created_at,
+    }
 
 @notifications.route('/notifications', methods=['GET'])
 @login_required
 def get_notifications():
-    conn = current_app.db
-    cursor = conn.cursor()
+    before = decode_notifications_cursor(request.args.get('before'))
+    notifications, next_cursor = retrieve_notifications(current_user.userid, before)
 
-    notifications = cursor.execute(
-        """
-        SELECT id, message, [read], created_at 
-        FROM Notification 
-        WHERE user_id = ? AND deleted = 0
-        ORDER BY created_at DESC
-        """,
-        (current_user.userid,)).fetchall()
+    # The first page tells the browser where to start polling /notifications/feed
+    latest_cursor = None
+    if before is None and notifications:
+        latest_cursor = encode_notifications_cursor(notifications[0])
+
+    notification_list = [notification_to_dict(n) for n in notifications]
 
-    unread_count = sum(1 for n in notifications if not n.read)
+    # unread_count comes from the counter, through inject_unread_count
+    return render_template('/notifications/notifications.html', notifications=notification_list,
+                           next_cursor=next_cursor, latest_cursor=latest_cursor, paginated=before is not None)
+
+@notifications.route('/notifications/feed', methods=['GET'])
+@login_required
+def notifications_feed():
+    # Polled by the notification center: only what arrived after the since
+    # cursor, plus the unread count for the badge
+    since = request.args.get('since')
+    since_cursor = decode_notifications_cursor(since)
+    if since and since_cursor is None:
+        return jsonify(error="Invalid since cursor."), 400
+    limit = min(max(request.args.get('limit', MAX_FEED_NOTIFICATIONS, type=int), 1), MAX_FEED_NOTIFICATIONS)
 
-    notification_list = [
-        {
-            "id": n.id,
-            "message": n.message,
-            "read": n.read,
-            "created_at": n.created_at,
-        }
-        for n in notifications]
+    rows, latest, has_more = retrieve_notifications_since(current_user.userid, since_cursor, limit)
+    items = []
+    for row in rows:
+        item = notification_to_dict(row)
+        item["created_at"] = row.created_at.strftime('%Y-%m-%d %H:%M')
+        items.append(item)
 
-    return render_template('/notifications/notifications.html', notifications=notification_list,unread_count=unread_count)
+    return jsonify(
+        notifications=items,
+        cursor=encode_notifications_cursor(latest) if latest else since,
+        has_more=has_more,
+        unread_count=get_unread_count(current_user.userid))
 
 @notifications.route('/notifications/mark-as-read/<int:notification_id>', methods=['POST'])
 @login_required
@@ -132,8 +300,10 @@ def mark_as_read(notification_id):
     cursor = conn.cursor()
 
     cursor.execute(
-        "UPDATE Notification SET [read] = 1 WHERE id = ? AND user_id = ?",
+        "UPDATE Notification SET [read] = 1 WHERE id = ? AND user_id = ? AND [read] = 0 AND deleted = 0",
         (notification_id, current_user.userid))
+    if cursor.rowcount:
+        adjust_unread_count(cursor, current_user.userid, -1)
     conn.commit()
 
     flash("Notification marked as read.", category="success")
@@ -148,7 +318,7 @@ def delete_notification(notification_id):
     # Check the type of notification
     notification = cursor.execute(
         """
-        SELECT type FROM Notification WHERE id = ? AND user_id = ? AND deleted = 0
+        SELECT type, [read] FROM Notification WHERE id = ? AND user_id = ? AND deleted = 0
         """,
         (notification_id, current_user.userid)).fetchone()
 
@@ -164,6 +334,8 @@ def delete_notification(notification_id):
             UPDATE Notification SET deleted = 1 WHERE id = ? AND user_id = ?
             """,
             (notification_id, current_user.userid))
+        if not notification.read:
+            adjust_unread_count(cursor, current_user.userid, -1)
     else:
         cursor.execute(
             "DELETE FROM Notification WHERE id = ? AND user_id = ? AND [read] = 1",
@@ -172,4 +344,81 @@ def delete_notification(notification_id):
     conn.commit()
 
     flash("Notification deleted.", category="success")
-    return redirect(url_for('notifications.get_notifications'))
\ No newline at end of file
+    return redirect(url_for('notifications.get_notifications'))
+
+# Selections beyond this are refused, which keeps the IN list well under the
+# 2100 parameters SQL Server accepts per statement
+MAX_BULK_NOTIFICATIONS = 500
+
+def mark_notifications_read(cursor, user_id, notification_ids=None):
+    # All of the user's unread notifications, or only notification_ids, in
+    # one UPDATE; the counter moves by the number of rows it changed
+    selection, params = selected_notifications(notification_ids)
+    cursor.execute(
+        f"UPDATE Notification SET [read] = 1 WHERE user_id = ? AND [read] = 0 AND deleted = 0{selection}",
+        (user_id,) + params)
+    updated = max(cursor.rowcount, 0)
+    if updated:
+        adjust_unread_count(cursor, user_id, -updated)
+    return updated
+
+def delete_notifications(cursor, user_id, notification_ids=None):
+    # Same rules as delete_notification: one_hour reminders are only flagged
+    # as deleted, so generate_one_hour_notifications does not recreate them,
+    # and other notifications are removed once they have been read
+    selection, params = selected_notifications(notification_ids)
+    cursor.execute(
+        f"UPDATE Notification SET deleted = 1 WHERE user_id = ? AND type = 'one_hour' AND deleted = 0{selection}",
+        (user_id,) + params)
+    deleted = max(cursor.rowcount, 0)
+    cursor.execute(
+        f"DELETE FROM Notification WHERE user_id = ? AND type <> 'one_hour' AND [read] = 1{selection}",
+        (user_id,) + params)
+    deleted += max(cursor.rowcount, 0)
+    if deleted:
+        cursor.execute(RECOUNT_UNREAD_SQL + " WHERE user_id = ?", (user_id,))
+    return deleted
+
+def selected_notifications(notification_ids):
+    if notification_ids is None:
+        return "", ()
+    placeholders = ', '.join('?' for _ in notification_ids)
+    return f" AND id IN ({placeholders})", tuple(notification_ids)
+
+@notifications.route('/notifications/bulk', methods=['POST'])
+@login_required
+def bulk_update_notifications():
+    # action is read or delete; scope is all, or selected with the ids in
+    # notification_ids
+    action = request.form.get('action')
+    scope = request.form.get('scope', 'selected')
+
+    notification_ids = None
+    if scope != 'all':
+        notification_ids = sorted(set(request.form.getlist('notification_ids', type=int)))
+        if not notification_ids:
+            flash("Select at least one notification.", category="error")
+            return redirect(url_for('notifications.get_notifications'))
+        if len(notification_ids) > MAX_BULK_NOTIFICATIONS:
+            flash(f"Select at most {MAX_BULK_NOTIFICATIONS} notifications at a time.", category="error")
+            return redirect(url_for('notifications.get_notifications'))
+
+    conn = current_app.db
+    cursor = conn.cursor()
+
+    if action == 'read':
+        updated = mark_notifications_read(cursor, current_user.userid, notification_ids)
+        conn.commit()
+        flash(f"{updated} notification(s) marked as read.", category="success")
+    elif action == 'delete':
+        deleted = delete_notifications(cursor, current_user.userid, notification_ids)
+        conn.commit()
+        flash(f"{deleted} notification(s) deleted.", category="success")
+    else:
+        flash("Unknown action.", category="error")
+    return redirect(url_for('notifications.get_notifications'))
+
+@notifications.route('/notifications/unread-count', methods=['GET'])
+@login_required
+def unread_count():
+    return jsonify(unread_count=get_unread_count(current_user.userid))
@@ -0,0 +1,138 @@
+import concurrent.futures
+import io
+import multiprocessing
+import re
+import threading
+import time
+
+import PyPDF2
+
+MAX_PDF_BYTES = 5 * 1024 * 1024
+MAX_PDF_PAGES = 20
+EXTRACTION_TIMEOUT = 10.0
+READ_CHUNK_SIZE = 64 * 1024
+
+SYMPTOMS_HEADING = re.compile(r"SYMPTOMS", re.IGNORECASE)
+# The section runs until the next line that starts with a letter
+SYMPTOMS_SECTION = re.compile(r"SYMPTOMS\s*([\s\S]+?)(?=\n\s*[A-Za-z]|\n\s*$)", re.IGNORECASE)
+SYMPTOMS_SECTION_CLOSED = re.compile(r"SYMPTOMS\s*([\s\S]+?)(?=\n\s*[A-Za-z])", re.IGNORECASE)
+
+
+class PdfRejected(Exception):
+    pass
+
+
+def read_upload(file, max_bytes=MAX_PDF_BYTES):
+    # Copies the upload into memory in chunks and gives up as soon as it
+    # passes max_bytes. The request body itself is already spooled by
+    # werkzeug; its size is bounded by MAX_CONTENT_LENGTH.
+    data = bytearray()
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return bytes(data)
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise PdfRejected(f"The PDF is larger than {max_bytes / (1024 * 1024):g} MB.")
+
+
+def split_symptoms(section):
+    symptoms = section.strip().split("\n")
+    return [symptom.strip('- ').strip() for symptom in symptoms if symptom.strip()]
+
+
+def extract_symptoms(data, max_pages=MAX_PDF_PAGES):
+    # Runs in a pool worker. Pages are read one at a time and reading stops
+    # as soon as the SYMPTOMS section is closed by the next heading, so the
+    # rest of the document is never extracted. Returns the symptoms and the
+    # time spent parsing the file and extracting text, in seconds.
+    start = time.perf_counter()
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    if len(reader.pages) > max_pages:
+        raise PdfRejected(f"The PDF has more than {max_pages} pages.")
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = ""
+    section_started = False
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        if section_started:
+            text += page_text
+        else:
+            # Until the heading shows up only the end of the previous page is
+            # kept, in case the heading is split across pages
+            text = text[-len("SYMPTOMS"):] + page_text
+            section_started = SYMPTOMS_HEADING.search(text) is not None
+        if section_started:
+            match = SYMPTOMS_SECTION_CLOSED.search(text)
+            if match:
+                return split_symptoms(match.group(1)), parse_time, time.perf_counter() - start
+
+    match = SYMPTOMS_SECTION.search(text)
+    symptoms = split_symptoms(match.group(1)) if match else []
+    return symptoms, parse_time, time.perf_counter() - start
+
+
+class PdfExtractor:
+    # Pool of worker processes for PDF extraction, so a slow or hostile
+    # document neither blocks the request thread's interpreter nor grows the
+    # web worker's memory. Workers are started on first use.
+    def __init__(self, max_workers=2, timeout=EXTRACTION_TIMEOUT, max_bytes=MAX_PDF_BYTES, max_pages=MAX_PDF_PAGES):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def extract(self, file):
+        # Returns (symptoms, timings) with timings in milliseconds per stage;
+        # raises PdfRejected for files over the limits, unreadable files and
+        # extractions that take longer than timeout
+        data = read_upload(file, self.max_bytes)
+        future = self._get_pool().submit(extract_symptoms, data, self.max_pages)
+        try:
+            symptoms, parse_time, extract_time = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            # The worker cannot be interrupted, so the pool is replaced and
+            # its processes stopped
+            self._reset_pool(terminate=True)
+            raise PdfRejected(f"Reading the PDF took longer than {self.timeout:.0f} seconds.")
+        except concurrent.futures.process.BrokenProcessPool:
+            self._reset_pool()
+            raise PdfRejected("The PDF could not be processed.")
+        except PdfRejected:
+            raise
+        except Exception as e:
+            print(f"Error processing PDF: {e}")
+            raise PdfRejected("The PDF could not be read.")
+        return symptoms, {"parse": parse_time * 1000, "extract": extract_time * 1000}
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Workers come from a forkserver that preloads this module, so
+                # they do not copy the web process with its threads and torch;
+                # without forkserver (Windows) they are spawned. Either way
+                # each worker imports the main script as __mp_main__, which
+                # app.py checks so that no second app is built.
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    def _reset_pool(self, terminate=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        if terminate:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,64 @@
+import datetime
+import hashlib
+import threading
+import time
+
+# Tables behind every cached list of doctors; code writing to one of them
+# invalidates it
+DOCTOR_DIRECTORY_TABLES = ('Medic', 'Specialization', 'User')
+
+class ReferenceCache:
+    # Cache for query results built from slow-changing tables. Every entry
+    # records the version of the tables it was read from; invalidate() bumps
+    # those versions after a write, so the next get() reloads. Entries also
+    # expire after ttl seconds, which bounds how long another worker's writes
+    # stay invisible to this process.
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, tables, loader):
+        return self.entry(key, tables, loader)[0]
+
+    def entry(self, key, tables, loader):
+        # (value, etag, last_modified). The ETag is a hash of the value, and
+        # last_modified only moves when a reload actually changed the value.
+        now = time.monotonic()
+        with self._lock:
+            versions = self._table_versions(tables)
+            entry = self._entries.get(key)
+            if entry and entry[0] == versions and entry[1] > now:
+                self.hits += 1
+                return entry[2:]
+            self.misses += 1
+
+        value = loader()
+        etag = hashlib.sha1(repr(value).encode()).hexdigest()
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous and previous[3] == etag:
+                last_modified = previous[4]
+            else:
+                last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+            # A write that happened while loading leaves the entry stale
+            if self._table_versions(tables) == versions:
+                self._entries[key] = (versions, now + self.ttl, value, etag, last_modified)
+        return value, etag, last_modified
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _table_versions(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
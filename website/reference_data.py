@@ -0,0 +1,71 @@
+import hashlib
+from flask import current_app, request
+from .reference_cache import DOCTOR_DIRECTORY_TABLES
+
+# Cached accessors for the slow-changing tables read on most pages. Rows come
+# from app.reference_cache and must not be modified by callers.
+
+def get_specializations():
+    return current_app.reference_cache.get(
+        'specializations', ('Specialization',),
+        lambda: current_app.db.cursor().execute("SELECT * FROM [Specialization]").fetchall())
+
+def get_specialization(specialization_id):
+    for specialization in get_specializations():
+        if str(specialization.specializationID) == str(specialization_id):
+            return specialization
+    return None
+
+def get_roles():
+    return current_app.reference_cache.get(
+        'roles', ('Role',),
+        lambda: current_app.db.cursor().execute("SELECT * FROM [Role]").fetchall())
+
+def get_role(role_id):
+    for role in get_roles():
+        if str(role.roleID) == str(role_id):
+            return role
+    return None
+
+def load_doctor_directory():
+    cursor = current_app.db.cursor()
+    return cursor.execute("SELECT [username], [specialization_name], [medicID], [Medic].[specializationID] FROM [Medic] LEFT JOIN [Specialization] ON [Medic].[specializationID] = [Specialization].[specializationID] INNER JOIN [User] ON [User].[userID] = [Medic].[medicID] ORDER BY [medicID]").fetchall()
+
+def doctor_directory():
+    # (doctors, etag, last_modified) for every doctor, with specialization
+    return current_app.reference_cache.entry('doctor_directory', DOCTOR_DIRECTORY_TABLES, load_doctor_directory)
+
+def get_doctor(medic_id):
+    doctors_by_id = current_app.reference_cache.get(
+        'doctors_by_id', DOCTOR_DIRECTORY_TABLES,
+        lambda: {doctor.medicID: doctor for doctor in doctor_directory()[0]})
+    try:
+        return doctors_by_id.get(int(medic_id))
+    except (TypeError, ValueError):
+        return None
+
+def personal_etag(etag, *parts):
+    # ETag of a response built from cached data plus per-user details
+    return hashlib.sha1(":".join(str(part) for part in (etag,) + parts).encode()).hexdigest()
+
+def not_modified_response(etag, last_modified=None):
+    return set_validators(current_app.response_class(status=304), etag, last_modified)
+
+def not_modified(etag, last_modified=None):
+    # True when the browser's cached copy, validated by If-None-Match or
+    # If-Modified-Since, is still current
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return request.if_modified_since >= last_modified
+    return False
+
+def set_validators(response, etag, last_modified=None):
+    # Browsers keep the response but revalidate it on every use
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.vary.add('Cookie')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
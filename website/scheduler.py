@@ -0,0 +1,43 @@
+import threading
+import time
+
+class Scheduler:
+    # Runs background jobs at fixed intervals, each inside an app context so
+    # they can use current_app.db like the blueprints do
+    def __init__(self, app):
+        self.app = app
+        self.jobs = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, interval):
+        if interval and interval > 0:
+            self.jobs.append({"name": name, "func": func, "interval": interval, "next_run": time.monotonic()})
+
+    def run_pending(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            if job["next_run"] <= now:
+                self.run_job(job)
+                job["next_run"] = now + job["interval"]
+
+    def run_job(self, job):
+        with self.app.app_context():
+            try:
+                job["func"]()
+            except Exception as e:
+                print(f"Scheduled job {job['name']} failed:", e)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            next_run = min((job["next_run"] for job in self.jobs), default=time.monotonic() + 1)
+            self._stop.wait(max(0.1, next_run - time.monotonic()))
+
+    def start(self):
+        if self._thread is None and self.jobs:
+            self._thread = threading.Thread(target=self.run_forever, name="telemedix-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
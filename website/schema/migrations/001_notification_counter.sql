@@ -0,0 +1,12 @@
+-- Azure SQL migration: per-user unread notification counter.
+-- The SQLite schema (../sqlite.sql) already contains this table.
+
+CREATE TABLE [NotificationCounter] (
+    [user_id] INT NOT NULL PRIMARY KEY REFERENCES [User] ([userID]) ON DELETE CASCADE,
+    [unread_count] INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO [NotificationCounter] ([user_id], [unread_count])
+SELECT [user_id], SUM(CASE WHEN [read] = 0 AND [deleted] = 0 THEN 1 ELSE 0 END)
+FROM [Notification]
+GROUP BY [user_id];
@@ -0,0 +1,6 @@
+-- Azure SQL migration: at most one 'one_hour' reminder per consultation and user,
+-- so the scheduled reminder job stays idempotent when runs overlap.
+
+CREATE UNIQUE INDEX [UX_Notification_one_hour]
+ON [Notification] ([consultation_id], [user_id])
+WHERE [type] = 'one_hour';
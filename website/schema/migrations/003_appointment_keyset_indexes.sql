@@ -0,0 +1,10 @@
+-- Azure SQL migration: indexes for the keyset-paginated /my-consultations
+-- listing, which seeks on (owner, appointment_date, appointmentID).
+
+CREATE INDEX [IX_Appointment_pacientID_date]
+ON [Appointment] ([pacientID], [appointment_date], [appointmentID])
+INCLUDE ([medicID], [notes]);
+
+CREATE INDEX [IX_Appointment_medicID_date]
+ON [Appointment] ([medicID], [appointment_date], [appointmentID])
+INCLUDE ([pacientID], [notes]);
@@ -0,0 +1,35 @@
+-- Azure SQL migration: cancellation becomes a status column instead of a
+-- "Cancellation Reason:" suffix appended to Appointment.notes. Existing
+-- cancelled rows are backfilled and the suffix is moved out of the notes.
+
+ALTER TABLE [Appointment] ADD
+    [status] VARCHAR(16) NOT NULL CONSTRAINT [DF_Appointment_status] DEFAULT 'BOOKED',
+    [cancellation_reason] NVARCHAR(500) NULL,
+    [cancelled_at] DATETIME NULL;
+GO
+
+ALTER TABLE [Appointment] ADD CONSTRAINT [CK_Appointment_status] CHECK ([status] IN ('BOOKED', 'CANCELLED'));
+GO
+
+-- Notes were written as "<notes>\n\n -Cancellation Reason: <reason>" or
+-- "<notes>\n\nCancellation Reason: -"
+UPDATE [Appointment]
+SET [status] = 'CANCELLED',
+    [cancellation_reason] = NULLIF(LTRIM(RTRIM(SUBSTRING([notes], CHARINDEX('Cancellation Reason:', [notes]) + LEN('Cancellation Reason:'), 4000))), '-'),
+    [notes] = NULLIF(TRIM(CHAR(13) + CHAR(10) + ' -' FROM LEFT([notes], CHARINDEX('Cancellation Reason:', [notes]) - 1)), '')
+WHERE [notes] LIKE '%Cancellation Reason:%';
+GO
+
+CREATE INDEX [IX_Appointment_pacientID_status_date]
+ON [Appointment] ([pacientID], [status], [appointment_date])
+INCLUDE ([medicID], [notes]);
+
+CREATE INDEX [IX_Appointment_medicID_status_date]
+ON [Appointment] ([medicID], [status], [appointment_date])
+INCLUDE ([pacientID], [notes]);
+
+-- Reminder scan: booked consultations by start time
+CREATE INDEX [IX_Appointment_booked_date]
+ON [Appointment] ([appointment_date])
+INCLUDE ([pacientID], [medicID])
+WHERE [status] = 'BOOKED';
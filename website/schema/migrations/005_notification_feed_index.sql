@@ -0,0 +1,7 @@
+-- Azure SQL migration: index for the keyset-paginated notification feed and
+-- the /notifications/feed polling endpoint, which seek on
+-- (user_id, deleted, created_at, id).
+
+CREATE INDEX [IX_Notification_user_feed]
+ON [Notification] ([user_id], [deleted], [created_at], [id])
+INCLUDE ([message], [read]);
@@ -0,0 +1,126 @@
+-- Schema of the Telemedix database for the SQLite backend.
+-- Mirrors the Azure SQL tables queried by the blueprints in website/.
+
+CREATE TABLE [Role] (
+    [roleID] INTEGER PRIMARY KEY,
+    [role_name] TEXT NOT NULL
+);
+
+INSERT INTO [Role] ([roleID], [role_name]) VALUES (1, 'ADMIN'), (2, 'PATIENT'), (3, 'DOCTOR');
+
+CREATE TABLE [User] (
+    [userID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [email] TEXT NOT NULL UNIQUE,
+    [password] TEXT NOT NULL,
+    [username] TEXT NOT NULL,
+    [birth_date] DATE,
+    [roleID] INTEGER REFERENCES [Role] ([roleID])
+);
+
+CREATE TABLE [Specialization] (
+    [specializationID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [specialization_name] TEXT NOT NULL
+);
+
+CREATE TABLE [Service] (
+    [serviceID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [service_name] TEXT NOT NULL,
+    [specializationID] INTEGER REFERENCES [Specialization] ([specializationID])
+);
+
+INSERT INTO [Service] ([serviceID], [service_name]) VALUES (1, 'Online consultation');
+
+CREATE TABLE [Medic] (
+    [medicID] INTEGER PRIMARY KEY REFERENCES [User] ([userID]) ON DELETE CASCADE,
+    [specializationID] INTEGER REFERENCES [Specialization] ([specializationID]),
+    [licence_no] TEXT
+);
+
+CREATE INDEX [IX_Medic_specializationID] ON [Medic] ([specializationID]);
+
+CREATE TABLE [Pacient] (
+    [pacientID] INTEGER PRIMARY KEY REFERENCES [User] ([userID]) ON DELETE CASCADE,
+    [insurance_no] TEXT,
+    [emergency_contact] TEXT
+);
+
+CREATE TABLE [TimeTable] (
+    [medicID] INTEGER PRIMARY KEY REFERENCES [Medic] ([medicID]) ON DELETE CASCADE,
+    [mon] TEXT,
+    [tue] TEXT,
+    [wed] TEXT,
+    [thu] TEXT,
+    [fri] TEXT,
+    [sat] TEXT,
+    [sun] TEXT
+);
+
+CREATE TABLE [Availability] (
+    [availabilityID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [medicID] INTEGER NOT NULL REFERENCES [Medic] ([medicID]) ON DELETE CASCADE,
+    [date] DATE NOT NULL,
+    [start_time] DATETIME NOT NULL,
+    [end_time] DATETIME NOT NULL,
+    [availability_status] TEXT NOT NULL DEFAULT 'FREE'
+);
+
+CREATE INDEX [IX_Availability_medicID_date] ON [Availability] ([medicID], [date], [availability_status]);
+CREATE INDEX [IX_Availability_medicID_start_time] ON [Availability] ([medicID], [start_time]);
+
+CREATE TABLE [Appointment] (
+    [appointmentID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [pacientID] INTEGER NOT NULL REFERENCES [Pacient] ([pacientID]) ON DELETE CASCADE,
+    [medicID] INTEGER NOT NULL REFERENCES [Medic] ([medicID]) ON DELETE CASCADE,
+    [appointment_date] DATETIME NOT NULL,
+    [availabilityID] INTEGER REFERENCES [Availability] ([availabilityID]),
+    [serviceID] INTEGER REFERENCES [Service] ([serviceID]),
+    [notes] TEXT,
+    [status] VARCHAR(16) NOT NULL DEFAULT 'BOOKED' CHECK ([status] IN ('BOOKED', 'CANCELLED')),
+    [cancellation_reason] VARCHAR(500),
+    [cancelled_at] DATETIME
+);
+
+CREATE INDEX [IX_Appointment_pacientID_date] ON [Appointment] ([pacientID], [appointment_date]);
+CREATE INDEX [IX_Appointment_medicID_date] ON [Appointment] ([medicID], [appointment_date]);
+CREATE INDEX [IX_Appointment_date] ON [Appointment] ([appointment_date]);
+CREATE INDEX [IX_Appointment_pacientID_status_date] ON [Appointment] ([pacientID], [status], [appointment_date]);
+CREATE INDEX [IX_Appointment_medicID_status_date] ON [Appointment] ([medicID], [status], [appointment_date]);
+CREATE INDEX [IX_Appointment_booked_date] ON [Appointment] ([appointment_date]) WHERE [status] = 'BOOKED';
+
+CREATE TABLE [MedicalRecord] (
+    [recordID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [pacientID] INTEGER NOT NULL REFERENCES [User] ([userID]) ON DELETE CASCADE
+);
+
+CREATE INDEX [IX_MedicalRecord_pacientID] ON [MedicalRecord] ([pacientID]);
+
+CREATE TABLE [Diagnosis] (
+    [diagnosisID] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [recordID] INTEGER NOT NULL REFERENCES [MedicalRecord] ([recordID]) ON DELETE CASCADE,
+    [medicID] INTEGER REFERENCES [Medic] ([medicID]),
+    [symptoms] TEXT,
+    [diagnosis] TEXT,
+    [treatment] TEXT
+);
+
+CREATE INDEX [IX_Diagnosis_recordID] ON [Diagnosis] ([recordID]);
+
+CREATE TABLE [Notification] (
+    [id] INTEGER PRIMARY KEY AUTOINCREMENT,
+    [user_id] INTEGER NOT NULL REFERENCES [User] ([userID]) ON DELETE CASCADE,
+    [consultation_id] INTEGER,
+    [message] TEXT NOT NULL,
+    [type] TEXT NOT NULL,
+    [read] BIT NOT NULL DEFAULT 0,
+    [deleted] BIT NOT NULL DEFAULT 0,
+    [created_at] DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX [IX_Notification_user_id] ON [Notification] ([user_id], [deleted], [created_at]);
+CREATE INDEX [IX_Notification_consultation_id] ON [Notification] ([consultation_id], [user_id], [type]);
+CREATE UNIQUE INDEX [UX_Notification_one_hour] ON [Notification] ([consultation_id], [user_id]) WHERE [type] = 'one_hour';
+
+CREATE TABLE [NotificationCounter] (
+    [user_id] INTEGER PRIMARY KEY REFERENCES [User] ([userID]) ON DELETE CASCADE,
+    [unread_count] INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,158 @@
+import bisect
+import datetime
+import threading
+import time
+from flask import current_app
+
+FREE_SLOTS_SQL = """
+    SELECT [Availability].[availabilityID], [Availability].[medicID], [Availability].[start_time], [Availability].[end_time], [Medic].[specializationID]
+    FROM [Availability]
+    JOIN [Medic] ON [Medic].[medicID] = [Availability].[medicID]
+    WHERE [Availability].[availability_status] = 'FREE' AND [Availability].[start_time] > ?"""
+
+
+class SlotIndex:
+    # Future FREE availability slots held in sorted arrays, one per doctor and
+    # one per specialization, so free-slot searches are a bisect instead of a
+    # table scan. Entries are (start_time, availabilityID, medicID, end_time)
+    # tuples, ordered by start time.
+    #
+    # Booking, cancellation and slot creation update the index of the process
+    # that handled them; every process also rebuilds it from the database once
+    # it is older than refresh_interval, which picks up changes made by other
+    # workers. Booking itself never trusts the index: the conditional UPDATE in
+    # book_consultation still decides who gets a slot.
+    def __init__(self, refresh_interval=300.0):
+        self.refresh_interval = refresh_interval
+
+        self._by_doctor = {}
+        self._by_specialization = {}
+        self._specialization_of = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        cursor = current_app.db.cursor()
+        rows = cursor.execute(FREE_SLOTS_SQL, datetime.datetime.now()).fetchall()
+
+        by_doctor = {}
+        by_specialization = {}
+        specialization_of = {}
+        for row in rows:
+            entry = (row.start_time, row.availabilityID, row.medicID, row.end_time)
+            by_doctor.setdefault(row.medicID, []).append(entry)
+            by_specialization.setdefault(row.specializationID, []).append(entry)
+            specialization_of[row.medicID] = row.specializationID
+        for entries in by_doctor.values():
+            entries.sort()
+        for entries in by_specialization.values():
+            entries.sort()
+
+        with self._lock:
+            self._by_doctor = by_doctor
+            self._by_specialization = by_specialization
+            self._specialization_of = specialization_of
+            self._loaded_at = time.monotonic()
+
+    def refresh_doctor(self, medic_id):
+        # Reloads one doctor's free slots, after slots were created for them
+        cursor = current_app.db.cursor()
+        rows = cursor.execute(FREE_SLOTS_SQL + " AND [Availability].[medicID] = ?", datetime.datetime.now(), medic_id).fetchall()
+        specialization_id = rows[0].specializationID if rows else None
+
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for entry in self._by_doctor.pop(medic_id, []):
+                self._remove_entry(self._by_specialization.get(self._specialization_of.get(medic_id)), entry)
+            self._specialization_of.pop(medic_id, None)
+            for row in rows:
+                self._add(row.availabilityID, row.medicID, row.start_time, row.end_time, specialization_id)
+
+    def add_slot(self, availability_id, medic_id, start_time, end_time, specialization_id):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._add(availability_id, medic_id, start_time, end_time, specialization_id)
+
+    def remove_slot(self, availability_id, medic_id, start_time):
+        with self._lock:
+            entries = self._by_doctor.get(medic_id)
+            if not entries:
+                return
+            index = bisect.bisect_left(entries, (start_time, availability_id))
+            if index < len(entries) and entries[index][1] == availability_id:
+                entry = entries.pop(index)
+                self._remove_entry(self._by_specialization.get(self._specialization_of.get(medic_id)), entry)
+
+    def free_slots(self, medic_id, start, end):
+        # Free slots of one doctor starting in [start, end)
+        self._ensure_fresh()
+        with self._lock:
+            return self._between(self._by_doctor.get(medic_id, []), start, end)
+
+    def first_free_slot(self, specialization_id, after):
+        slots = self.earliest_free_slots(specialization_id, after, None, 1)
+        return slots[0] if slots else None
+
+    def earliest_free_slots(self, specialization_id, start, end=None, limit=None, exclude_medic_id=None):
+        # Free slots across every doctor of a specialization starting in
+        # [start, end), earliest first, leaving out exclude_medic_id's own
+        self._ensure_fresh()
+        with self._lock:
+            return self._between(self._by_specialization.get(specialization_id, []), start, end, limit, exclude_medic_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "doctors": len(self._by_doctor),
+                "slots": sum(len(entries) for entries in self._by_doctor.values()),
+                "age": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+            }
+
+    def _ensure_fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+            return
+        # While one thread rebuilds a stale index the others keep reading the
+        # old one; only the very first load makes callers wait
+        if not self._load_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+                self.load()
+        finally:
+            self._load_lock.release()
+
+    def _between(self, entries, start, end, limit=None, exclude_medic_id=None):
+        # Slots in the past are still in the arrays until the next rebuild
+        start = max(start, datetime.datetime.now())
+        first = bisect.bisect_left(entries, (start,))
+        last = len(entries) if end is None else bisect.bisect_left(entries, (end,), first)
+        if exclude_medic_id is None:
+            if limit is not None:
+                last = min(last, first + limit)
+            selected = entries[first:last]
+        else:
+            selected = []
+            for index in range(first, last):
+                if entries[index][2] == exclude_medic_id:
+                    continue
+                selected.append(entries[index])
+                if limit is not None and len(selected) == limit:
+                    break
+        return [{'availability_id': entry[1], 'medic_id': entry[2], 'start_time': entry[0], 'end_time': entry[3]}
+                for entry in selected]
+
+    def _add(self, availability_id, medic_id, start_time, end_time, specialization_id):
+        entry = (start_time, availability_id, medic_id, end_time)
+        bisect.insort(self._by_doctor.setdefault(medic_id, []), entry)
+        bisect.insort(self._by_specialization.setdefault(specialization_id, []), entry)
+        self._specialization_of[medic_id] = specialization_id
+
+    def _remove_entry(self, entries, entry):
+        if not entries:
+            return
+        index = bisect.bisect_left(entries, entry)
+        if index < len(entries) and entries[index] == entry:
+            entries.pop(index)
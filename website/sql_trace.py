@@ -0,0 +1,200 @@
+import datetime
+import decimal
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import Blueprint, current_app, g, jsonify, request
+from flask_login import current_user, login_required
+
+sql_debug = Blueprint('sql_debug', __name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+ADMIN_ROLE_ID = 1
+
+# Parameter values kept in traces; anything else (emails, password hashes,
+# notes, messages) is replaced by its type
+SAFE_PARAM_TYPES = (bool, int, float, decimal.Decimal, datetime.date, datetime.time, type(None))
+
+def redact_params(params):
+    if isinstance(params, str):
+        return params
+    values = []
+    for value in params:
+        if isinstance(value, (tuple, list)):
+            values.append(redact_params(value))
+        elif isinstance(value, SAFE_PARAM_TYPES):
+            values.append(value)
+        else:
+            values.append(f"<{type(value).__name__}>")
+    return values
+
+def query_shape(sql):
+    # The statement with literals replaced by ? and whitespace collapsed, so
+    # the same query with different values has the same shape
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return " ".join(shape.split())
+
+
+class RequestTrace:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.queries = []
+        self.commits = 0
+
+    def record(self, sql, params, duration, rowcount):
+        query = {
+            "sql": " ".join(sql.split()),
+            "shape": query_shape(sql),
+            "params": repr(redact_params(params))[:200],
+            "duration_ms": duration * 1000,
+            "rowcount": rowcount,
+            "rows_fetched": 0,
+        }
+        self.queries.append(query)
+        return query
+
+    def duration_ms(self):
+        return sum(query["duration_ms"] for query in self.queries)
+
+    def repeated_shapes(self, threshold):
+        # Shapes run at least threshold times in one request: the N+1 pattern
+        counts = Counter(query["shape"] for query in self.queries)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def to_dict(self, threshold):
+        return {
+            "method": self.method,
+            "path": self.path,
+            "statements": len(self.queries),
+            "commits": self.commits,
+            "duration_ms": self.duration_ms(),
+            "repeated": self.repeated_shapes(threshold),
+            "queries": self.queries,
+        }
+
+
+class TracingCursor:
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+        self._query = None
+
+    def execute(self, sql, *params):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            self._query = self._trace.record(sql, params, time.perf_counter() - start, getattr(self._cursor, "rowcount", -1))
+        return self
+
+    def executemany(self, sql, params):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, params)
+        finally:
+            self._query = self._trace.record(sql, f"<{len(params)} rows>", time.perf_counter() - start, getattr(self._cursor, "rowcount", -1))
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._count(1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    def fetchmany(self, size):
+        rows = self._cursor.fetchmany(size)
+        self._count(len(rows))
+        return rows
+
+    def fetchval(self):
+        row = self.fetchone()
+        return row[0] if row else None
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count(1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Options such as fast_executemany belong to the wrapped cursor
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def _count(self, rows):
+        if self._query is not None:
+            self._query["rows_fetched"] += rows
+
+
+class SqlTracer:
+    # Records every statement issued through app.db during a request: SQL,
+    # parameters, row counts and durations. The totals are sent back as
+    # X-SQL-* and Server-Timing headers, shapes repeated within one request
+    # are reported as possible N+1 queries, and the last traces are kept for
+    # the /debug/sql endpoint.
+    def __init__(self, app, threshold=3, history=100):
+        self.threshold = threshold
+        self._traces = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def wrap_cursor(self, cursor):
+        trace = g.get("sql_trace")
+        return TracingCursor(cursor, trace) if trace is not None else cursor
+
+    def record_commit(self):
+        trace = g.get("sql_trace")
+        if trace is not None:
+            trace.commits += 1
+
+    def recent(self):
+        with self._lock:
+            return [trace.to_dict(self.threshold) for trace in self._traces]
+
+    def _start(self):
+        g.sql_trace = RequestTrace(request.method, request.full_path.rstrip("?"))
+
+    def _finish(self, response):
+        trace = g.pop("sql_trace", None)
+        if trace is None:
+            return response
+
+        repeated = trace.repeated_shapes(self.threshold)
+        response.headers["X-SQL-Statements"] = str(len(trace.queries))
+        response.headers["X-SQL-Duration-Ms"] = f"{trace.duration_ms():.1f}"
+        response.headers.add("Server-Timing", f"sql;dur={trace.duration_ms():.1f}")
+        if repeated:
+            response.headers["X-SQL-Repeated"] = str(len(repeated))
+            for shape, count in repeated.items():
+                print(f"Possible N+1 on {trace.method} {trace.path}: {count}x {shape[:160]}")
+
+        if request.blueprint != sql_debug.name:
+            with self._lock:
+                self._traces.append(trace)
+        return response
+
+
+@sql_debug.route('/debug/sql', methods=['GET'])
+@login_required
+def recent_sql():
+    # Traces cover every user's requests, so only admins see them outside debug mode
+    if not current_app.debug and str(current_user.roleid) != str(ADMIN_ROLE_ID):
+        return jsonify(error="Forbidden"), 403
+    return jsonify(threshold=current_app.sql_tracer.threshold, requests=current_app.sql_tracer.recent())
@@ -0,0 +1,62 @@
+import threading
+import time
+
+class UserCache:
+    # Short-lived cache of [User] rows for the Flask-Login user_loader.
+    # Entries expire after ttl seconds, which also bounds how stale another
+    # worker's copy can get. An optional shared store (any object with
+    # get/set/delete, e.g. a memcached client) lets workers share entries and
+    # invalidations.
+    def __init__(self, ttl=30.0, max_entries=10000, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, userid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(userid)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+
+        if self.shared is not None:
+            row = self.shared.get(self._key(userid))
+            if row is not None:
+                self._remember(userid, row)
+                with self._lock:
+                    self.hits += 1
+                return row
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, userid, row):
+        self._remember(userid, row)
+        if self.shared is not None:
+            self.shared.set(self._key(userid), row, self.ttl)
+
+    def invalidate(self, userid):
+        with self._lock:
+            self._entries.pop(userid, None)
+        if self.shared is not None:
+            self.shared.delete(self._key(userid))
+
+    def _remember(self, userid, row):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[userid] = (time.monotonic() + self.ttl, row)
+
+    def _key(self, userid):
+        return f"telemedix:user:{userid}"
@@ -1,14 +1,13 @@
 from flask import Blueprint, current_app, render_template
 from flask_login import login_required, current_user
 import time
-from .notifications import generate_one_hour_notifications
+from .reference_data import doctor_directory, get_specializations
 
 views = Blueprint('views', __name__)
 
 @views.route('/')
 @login_required
 def home():
-    generate_one_hour_notifications()
     return render_template("home.html", user=current_user)
 
 @views.route('/account')
@@ -41,8 +40,5 @@ def doctors_list():
 @views.route('/consultation-form')
 @login_required
 def consultation_form():
-    conn = current_app.db
-    cursor = conn.cursor()
-    doctors = cursor.execute("SELECT * FROM [Medic], [User], [Specialization] WHERE [User].[userID] = [Medic].[medicID] AND [Medic].[specializationID] = [Specialization].[specializationID] AND [User].[userID] <> ?", current_user.userid).fetchall()
-    specializatons = cursor.execute("SELECT * FROM [Specialization]").fetchall()
-    return render_template("consultations/consultation_form.html", user=current_user, doctors=doctors, specializations=specializatons)
+    doctors = [doctor for doctor in doctor_directory()[0] if doctor.specializationID is not None and doctor.medicID != current_user.userid]
+    return render_template("consultations/consultation_form.html", user=current_user, doctors=doctors, specializations=get_specializations())